@@ -4,13 +4,23 @@ from PyQt5.QtWidgets import *
 from PyQt5.QtCore import *
 from database import Database
 from queries import Queries
+from workers import QueryRunner
+
+def clear_layout(layout):
+    while layout.count():
+        child = layout.takeAt(0)
+        if child.widget():
+            child.widget().deleteLater()
 
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.db = Database.get_instance()
         self.queries = Queries(self.db.client)
+        # Every Queries call runs on this pool so the window never waits on the network
+        self.runner = QueryRunner()
         self.user = None  # Logged-in user
+        self.loaded_tabs = set()  # Tabs filled since the last login
         self.setup_ui()
 
     def setup_ui(self):
@@ -29,32 +39,49 @@ class MainWindow(QMainWindow):
         layout.addWidget(self.tabs)
         self.tabs.setVisible(False)
 
-        # Create tabs
+        # Create tabs; each one is filled the first time it is shown
         self.create_tabs()
+        self.tabs.currentChanged.connect(self.load_tab)
 
     def create_login_section(self, layout):
         login_group = QGroupBox("Login")
         login_layout = QHBoxLayout()
         self.handle_input = QLineEdit()
         self.handle_input.setPlaceholderText("Enter Codeforces Handle")
-        login_btn = QPushButton("Login")
-        login_btn.clicked.connect(self.handle_login)
+        self.login_btn = QPushButton("Login")
+        self.login_btn.clicked.connect(self.handle_login)
         login_layout.addWidget(self.handle_input)
-        login_layout.addWidget(login_btn)
+        login_layout.addWidget(self.login_btn)
         login_group.setLayout(login_layout)
         layout.addWidget(login_group)
 
     def handle_login(self):
         screen_name = self.handle_input.text()
-        user = self.queries.login_user(screen_name)
+        # Anything still loading belongs to the previous user; cancelled tabs
+        # are filled again when they are next shown
+        self.runner.cancel_all()
+        self.loaded_tabs.clear()
+        self.login_btn.setEnabled(False)
+        self.runner.submit('login', self.queries.login_user, screen_name,
+                           on_result=lambda user: self.on_login(screen_name, user),
+                           on_error=self.on_login_error)
+
+    def on_login(self, screen_name, user):
+        self.login_btn.setEnabled(True)
         if user:
             self.user = user
-            QMessageBox.information(self, "Login Successful", f"Welcome {screen_name}!")
-            self.populate_tabs()
             self.tabs.setVisible(True)
+            self.load_tab(self.tabs.currentIndex())
+            QMessageBox.information(self, "Login Successful", f"Welcome {screen_name}!")
         else:
+            self.load_tab(self.tabs.currentIndex())
             QMessageBox.warning(self, "Login Failed", "User not found.")
 
+    def on_login_error(self, message):
+        self.login_btn.setEnabled(True)
+        self.load_tab(self.tabs.currentIndex())
+        QMessageBox.warning(self, "Login Failed", f"Could not reach the database: {message}")
+
     def create_tabs(self):
         # Tab 1: Contests as Writer
         self.tab_writer = QWidget()
@@ -72,35 +99,62 @@ class MainWindow(QMainWindow):
         self.tab_top_auc = QWidget()
         self.tabs.addTab(self.tab_top_auc, "Top AUC Users")
 
-    def populate_tabs(self):
-        self.populate_writer_tab()
-        self.populate_top_users_tab()
-        self.populate_top_orgs_tab()
-        self.populate_top_auc_tab()
+        for tab in (self.tab_writer, self.tab_top_users, self.tab_top_orgs, self.tab_top_auc):
+            tab.setLayout(QVBoxLayout())
+
+        self.tab_loaders = {
+            self.tab_writer: self.populate_writer_tab,
+            self.tab_top_users: self.populate_top_users_tab,
+            self.tab_top_orgs: self.populate_top_orgs_tab,
+            self.tab_top_auc: self.populate_top_auc_tab,
+        }
+
+    def load_tab(self, index):
+        tab = self.tabs.widget(index)
+        if self.user is None or tab in self.loaded_tabs:
+            return
+        self.loaded_tabs.add(tab)
+        self.tab_loaders[tab]()
+
+    def show_loading(self, layout):
+        clear_layout(layout)
+        layout.addWidget(QLabel("Loading..."))
+
+    def show_error(self, layout, message):
+        clear_layout(layout)
+        layout.addWidget(QLabel(f"Could not load data: {message}"))
 
     def populate_writer_tab(self):
-        layout = QVBoxLayout()
-        self.tab_writer.setLayout(layout)
-
-        if self.user:
-            # Get contests where user is a writer using username instead of userid
-            contests = self.queries.get_user_written_contests(self.user['username'])
-            if contests:
-                for contest in contests:
-                    layout.addWidget(QLabel(
-                        f"Contest ID: {contest['contest_id']}, Name: {contest['contest_name']}, Date: {contest['start_time']}"
-                    ))
-            else:
-                layout.addWidget(QLabel("No contests found where you are a writer."))
+        layout = self.tab_writer.layout()
+        self.show_loading(layout)
+        # The logged-in user row already has the userid, so this is a single request
+        self.runner.submit('writer', self.queries.get_user_written_contests, self.user,
+                           on_result=self.show_writer_contests,
+                           on_error=lambda message: self.show_error(layout, message))
+
+    def show_writer_contests(self, contests):
+        layout = self.tab_writer.layout()
+        clear_layout(layout)
+        if contests:
+            for contest in contests:
+                layout.addWidget(QLabel(
+                    f"Contest ID: {contest['contest_id']}, Name: {contest['contest_name']}, Date: {contest['start_time']}"
+                ))
         else:
-            layout.addWidget(QLabel("Please log in to view contests where you are a writer."))
+            layout.addWidget(QLabel("No contests found where you are a writer."))
 
     def populate_top_users_tab(self):
-        layout = QVBoxLayout()
-        self.tab_top_users.setLayout(layout)
-
+        layout = self.tab_top_users.layout()
+        self.show_loading(layout)
         # Get top users by consecutive days and problems solved
-        top_days, top_problems = self.queries.get_top_users_by_days_and_problems()
+        self.runner.submit('top_users', self.queries.get_top_users_by_days_and_problems,
+                           on_result=self.show_top_users,
+                           on_error=lambda message: self.show_error(layout, message))
+
+    def show_top_users(self, result):
+        top_days, top_problems = result
+        layout = self.tab_top_users.layout()
+        clear_layout(layout)
 
         top_days_group = QGroupBox("Top 10 Users by Max Consecutive Days")
         top_days_layout = QVBoxLayout()
@@ -117,30 +171,25 @@ class MainWindow(QMainWindow):
         layout.addWidget(top_problems_group)
 
     def populate_top_orgs_tab(self):
-        layout = QVBoxLayout()
-        self.tab_top_orgs.setLayout(layout)
+        layout = self.tab_top_orgs.layout()
+        clear_layout(layout)
 
         # Create country selection section
         selection_group = QGroupBox("Select Country")
         selection_layout = QHBoxLayout()
 
-        # Add country dropdown
+        # Add country dropdown, filled once the country list arrives
         self.country_combo = QComboBox()
-        # Get unique countries from database
-        response = self.queries.client.table('User') \
-            .select('country') \
-            .not_.is_('country', 'null') \
-            .execute()
-        countries = sorted(list(set(u['country'] for u in response.data if u['country'])))
-        self.country_combo.addItems(countries)
+        self.country_combo.setPlaceholderText("Loading countries...")
 
         # Add search button
-        search_btn = QPushButton("Show Organizations")
-        search_btn.clicked.connect(self.show_top_orgs)
+        self.orgs_btn = QPushButton("Show Organizations")
+        self.orgs_btn.setEnabled(False)
+        self.orgs_btn.clicked.connect(self.show_top_orgs)
 
         selection_layout.addWidget(QLabel("Country:"))
         selection_layout.addWidget(self.country_combo)
-        selection_layout.addWidget(search_btn)
+        selection_layout.addWidget(self.orgs_btn)
         selection_group.setLayout(selection_layout)
         layout.addWidget(selection_group)
 
@@ -150,20 +199,28 @@ class MainWindow(QMainWindow):
         self.orgs_results.setLayout(self.orgs_results_layout)
         layout.addWidget(self.orgs_results)
 
-    def show_top_orgs(self):
-        # Clear previous results
-        while self.orgs_results_layout.count():
-            child = self.orgs_results_layout.takeAt(0)
-            if child.widget():
-                child.widget().deleteLater()
+        # Countries come from the country table, cached between logins
+        self.runner.submit('countries', self.queries.get_countries,
+                           on_result=self.show_countries,
+                           on_error=lambda message: self.show_error(self.orgs_results_layout, message))
+
+    def show_countries(self, countries):
+        self.country_combo.addItems(countries)
+        self.orgs_btn.setEnabled(True)
 
+    def show_top_orgs(self):
         country = self.country_combo.currentText()
         if not country:
             return
 
-        # Get top organizations
-        top_orgs = self.queries.get_top_organizations_by_ratings(country)
-        
+        # Get top organizations; a newer selection supersedes a pending one
+        self.show_loading(self.orgs_results_layout)
+        self.runner.submit('top_orgs', self.queries.get_top_organizations_by_ratings, country,
+                           on_result=lambda top_orgs: self.show_top_orgs_result(country, top_orgs),
+                           on_error=lambda message: self.show_error(self.orgs_results_layout, message))
+
+    def show_top_orgs_result(self, country, top_orgs):
+        clear_layout(self.orgs_results_layout)
         if top_orgs:
             self.orgs_results.setTitle(f"Top 5 Organizations in {country}")
             for org in top_orgs:
@@ -173,10 +230,16 @@ class MainWindow(QMainWindow):
             self.orgs_results_layout.addWidget(QLabel("No organizations found for this country."))
 
     def populate_top_auc_tab(self):
-        layout = QVBoxLayout()
-        self.tab_top_auc.setLayout(layout)
+        layout = self.tab_top_auc.layout()
+        self.show_loading(layout)
+        self.runner.submit('top_auc', self.queries.get_top_auc_users,
+                           on_result=self.show_top_auc,
+                           on_error=lambda message: self.show_error(layout, message))
+
+    def show_top_auc(self, top_users):
+        layout = self.tab_top_auc.layout()
+        clear_layout(layout)
 
-        top_users = self.queries.get_top_auc_users()
         auc_group = QGroupBox("Top 10 AUC Users by Rating")
         auc_layout = QVBoxLayout()
         if top_users:
@@ -187,6 +250,12 @@ class MainWindow(QMainWindow):
         auc_group.setLayout(auc_layout)
         layout.addWidget(auc_group)
 
+    def closeEvent(self, event):
+        # Drop pending results and let running requests finish before Qt tears down
+        self.runner.cancel_all()
+        self.runner.wait(5000)
+        super().closeEvent(event)
+
 if __name__ == "__main__":
     import sys
     app = QApplication(sys.argv)
@@ -0,0 +1,235 @@
+"""
+Latency benchmarks for the GUI queries against a local Postgres stand-in.
+
+Usage:
+    BENCH_PG_DSN=postgresql://postgres@localhost/postgres python benchmarks.py top-orgs [users] [latency_ms]
+
+Each run creates a throwaway schema, fills a "User" table with generated
+rows, installs the SQL from "schema design/" and drops the schema again.
+PostgresClient answers the small subset of the supabase client API that
+Queries uses, so the real Queries methods are measured; `latency_ms` is added
+to every round trip to stand in for the network hop to Supabase.
+"""
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+import psycopg2
+import psycopg2.extras
+
+from queries import Queries
+
+SCHEMA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'schema design')
+
+
+class Response:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class PostgresRequest:
+    """One table select or RPC call, built up like a postgrest request."""
+
+    def __init__(self, client, sql, params=()):
+        self.client = client
+        self.sql = sql
+        self.params = list(params)
+        self.filters = []
+        self.filter_params = []
+        self.suffix = ''
+        self.count = None
+        self.negate = False
+
+    def select(self, columns, count=None):
+        self.sql = self.sql.replace('*', columns, 1)
+        self.count = count
+        return self
+
+    def _filter(self, condition, *params):
+        if self.negate:
+            condition, self.negate = f"NOT ({condition})", False
+        self.filters.append(condition)
+        self.filter_params.extend(params)
+        return self
+
+    def eq(self, column, value):
+        return self._filter(f"{column} = %s", value)
+
+    def is_(self, column, value):
+        return self._filter(f"{column} IS {value.upper()}")
+
+    @property
+    def not_(self):
+        self.negate = True
+        return self
+
+    def order(self, column, desc=False):
+        self.suffix += f" ORDER BY {column}{' DESC' if desc else ''}"
+        return self
+
+    def limit(self, rows):
+        self.suffix += f" LIMIT {int(rows)}"
+        return self
+
+    def execute(self):
+        where = ' WHERE ' + ' AND '.join(self.filters) if self.filters else ''
+        params = self.params + self.filter_params
+        count = None
+        if self.count:
+            table = self.sql.split(' FROM ', 1)[1]
+            count = self.client.run(f"SELECT COUNT(*) AS count FROM {table}{where}", params, round_trip=False)[0]['count']
+        return Response(self.client.run(self.sql + where + self.suffix, params), count)
+
+
+class PostgresClient:
+    """Minimal stand-in for the supabase client: the table() filters Queries uses, and rpc()."""
+
+    def __init__(self, conn, latency=0.0):
+        self.conn = conn
+        self.latency = latency
+        self.round_trips = 0
+        self.rows = 0
+
+    def table(self, name):
+        return PostgresRequest(self, f'SELECT * FROM "{name}"')
+
+    def rpc(self, function, params):
+        arguments = ', '.join(f"{name} => %s" for name in params)
+        return PostgresRequest(self, f"SELECT * FROM {function}({arguments})", params.values())
+
+    def run(self, sql, params, round_trip=True):
+        if round_trip:
+            # A counted select comes back in the same response as its rows
+            self.round_trips += 1
+            time.sleep(self.latency)
+        with self.conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+            cursor.execute(sql, params)
+            rows = [dict(row) for row in cursor.fetchall()]
+        if round_trip:
+            self.rows += len(rows)
+        return rows
+
+
+def create_bench_schema(conn, users):
+    """Fill a fresh schema with `users` generated users; returns the schema name."""
+    schema = f"bench_{uuid.uuid4().hex[:8]}"
+    with conn.cursor() as cursor:
+        cursor.execute(f"CREATE SCHEMA {schema}")
+        cursor.execute(f"SET search_path TO {schema}")
+        cursor.execute("""
+            CREATE TABLE "User" (
+                userid SERIAL PRIMARY KEY, username TEXT UNIQUE, rating INT, max_streak INT,
+                problems_solved INT, organization TEXT, country TEXT
+            )
+        """)
+        rows = io.StringIO()
+        for i in range(users):
+            # A few large countries, as on Codeforces, and a long tail of organizations
+            country = 'Egypt' if i % 4 == 0 else f"Country {i % 97}"
+            organization = f"Org {i % 2003}" if i % 5 else ''
+            rating = str(800 + (i * 37) % 2800) if i % 11 else '\\N'
+            rows.write(f"user{i}\t{rating}\t{i % 100}\t{i % 3000}\t{organization}\t{country}\n")
+        rows.seek(0)
+        cursor.copy_from(rows, 'User', columns=('username', 'rating', 'max_streak', 'problems_solved',
+                                                 'organization', 'country'))
+        cursor.execute('ANALYZE "User"')
+        cursor.execute("CREATE TABLE country (country_id SERIAL PRIMARY KEY, name TEXT UNIQUE)")
+        cursor.execute('INSERT INTO country (name) SELECT DISTINCT country FROM "User" WHERE country IS NOT NULL')
+    conn.commit()
+    return schema
+
+
+def install_sql(conn, filename):
+    with open(os.path.join(SCHEMA_DIR, filename), encoding='utf-8') as f:
+        sql = f.read()
+    with conn.cursor() as cursor:
+        cursor.execute(sql)
+    conn.commit()
+
+
+def measure(name, client, call, repeat=10):
+    client.round_trips = client.rows = 0
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+    print(f"{name:>12}: median {statistics.median(timings) * 1000:,.1f} ms, "
+          f"{client.round_trips // repeat} round trips, {client.rows // repeat:,} rows received per call")
+
+
+def bench_top_orgs(args):
+    """get_top_organizations_by_ratings: client-side aggregation vs the RPC vs the materialized view."""
+    users = int(args[0]) if args else 200000
+    latency = float(args[1]) / 1000 if len(args) > 1 else 0.02
+
+    conn = psycopg2.connect(os.environ.get('BENCH_PG_DSN', 'postgresql://postgres@localhost/postgres'))
+    schema = create_bench_schema(conn, users)
+    try:
+        install_sql(conn, 'top_organizations.sql')
+        client = PostgresClient(conn, latency)
+        print(f"{users:,} users, {latency * 1000:.0f} ms per round trip, country 'Egypt'")
+
+        measure('client-side', client, lambda: Queries(client)._get_top_organizations_client_side('Egypt'))
+        measure('rpc', client, lambda: Queries(client).get_top_organizations_by_ratings('Egypt'))
+        measure('materialized', client, lambda: Queries(
+            client, top_organizations_rpc='top_organizations_by_rating_cached'
+        ).get_top_organizations_by_ratings('Egypt'))
+    finally:
+        conn.rollback()
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA {schema} CASCADE")
+        conn.commit()
+        conn.close()
+
+
+def scan_user_countries(client):
+    """The country lookup populate_top_orgs_tab used to run on every login."""
+    response = client.table('User') \
+        .select('country') \
+        .not_.is_('country', 'null') \
+        .execute()
+    return sorted(set(u['country'] for u in response.data if u['country']))
+
+
+def bench_countries(args):
+    """Country picker: distinct scan of "User" vs the cached country table."""
+    users = int(args[0]) if args else 200000
+    latency = float(args[1]) / 1000 if len(args) > 1 else 0.02
+
+    conn = psycopg2.connect(os.environ.get('BENCH_PG_DSN', 'postgresql://postgres@localhost/postgres'))
+    schema = create_bench_schema(conn, users)
+    try:
+        install_sql(conn, 'country_version.sql')
+        client = PostgresClient(conn, latency)
+        print(f"{users:,} users, {latency * 1000:.0f} ms per round trip")
+        with tempfile.TemporaryDirectory() as tmp:
+            queries = Queries(client, country_cache_file=os.path.join(tmp, 'country_cache.json'))
+            assert queries.get_countries() == scan_user_countries(client)
+
+            measure('user scan', client, lambda: scan_user_countries(client))
+            measure('cached', client, queries.get_countries)
+            measure('uncached', client, Queries(client, country_cache_file=None).get_countries)
+    finally:
+        conn.rollback()
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA {schema} CASCADE")
+        conn.commit()
+        conn.close()
+
+
+BENCHMARKS = {
+    'top-orgs': bench_top_orgs,
+    'countries': bench_countries,
+}
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print(__doc__)
+        sys.exit(1)
+    BENCHMARKS[sys.argv[1]](sys.argv[2:])
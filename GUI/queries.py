@@ -1,55 +1,52 @@
 # queries.py
+import json
+import logging
+import os
 from datetime import datetime
 
+from postgrest.exceptions import APIError
+
+logger = logging.getLogger(__name__)
+
+# Next to this file rather than in the working directory; listed in .gitignore
+COUNTRY_CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'country_cache.json')
+
 class Queries:
-    def __init__(self, client):
+    def __init__(self, client, top_organizations_rpc='top_organizations_by_rating', country_cache_file=COUNTRY_CACHE_FILE):
         self.client = client
+        self.country_cache_file = country_cache_file
+        # Server-side aggregate from "schema design/top_organizations.sql"; use
+        # 'top_organizations_by_rating_cached' to read the materialized view instead
+        self.top_organizations_rpc = top_organizations_rpc
 
     def login_user(self, screen_name):
         # Login user by username
         response = self.client.table('User').select('*').eq('username', screen_name).execute()
         return response.data[0] if response.data else None
 
-    def get_user_written_contests(self, username):
-        """Get contests where user is writer"""
-        print(f"Looking up contests for user: {username}")
-        
-        # Get user's ID from username string
-        user_response = self.client.table('User') \
-            .select('username, userid') \
-            .eq('username', username) \
-            .execute()
-        
-        print(f"User response: {user_response.data}")
-        
-        if not user_response.data:
-            print("No user found")
-            return []
-        
-        userid = user_response.data[0]['userid']
-        print(f"Found userid: {userid}")
-        
-        # Get contest IDs where user is writer
-        contests_response = self.client.table('contestwriter') \
-            .select('*') \
-            .eq('user_id', userid) \
+    def get_user_written_contests(self, user):
+        """
+        Get contests where user is writer.
+
+        `user` is the row returned by login_user. The contestwriter link is
+        embedded as an inner join, so the contests come back in one request.
+        A plain username is still accepted and costs one extra lookup.
+        """
+        if isinstance(user, str):
+            user = self.login_user(user)
+            if not user:
+                logger.debug("No user found")
+                return []
+
+        response = self.client.table('contest') \
+            .select('*, contestwriter!inner(user_id)') \
+            .eq('contestwriter.user_id', user['userid']) \
             .execute()
-        
-        print(f"Contest writer response: {contests_response.data}")
-        
-        contest_ids = [c['contest_id'] for c in contests_response.data]
-        
-        if contest_ids:
-            print(f"Found contest IDs: {contest_ids}")
-            contests_info = self.client.table('contest') \
-                .select('*') \
-                .in_('contest_id', contest_ids) \
-                .execute()
-            print(f"Contest info: {contests_info.data}")
-            return contests_info.data
-        
-        print("No contests found")
-        return []
+
+        # Drop the embedded join rows; callers only need the contest columns
+        contests = [{k: v for k, v in contest.items() if k != 'contestwriter'} for contest in response.data]
+        logger.debug(f"Found {len(contests)} contests written by {user['username']}")
+        return contests
 
     def get_top_users_by_days_and_problems(self):
         # Get top 10 users by max_streak and problems_solved
@@ -81,17 +78,87 @@ class Queries:
         
         return filtered_data
 
-    def get_top_organizations_by_ratings(self, country):
+    def get_countries(self):
+        """
+        Sorted country names for the country picker.
+
+        Read from the normalized country table and cached in
+        `country_cache_file`. The cache is keyed on a version of the table
+        (see _country_list_version) and rebuilt whenever it changes, so a
+        login costs one tiny request instead of a scan of every user. A
+        missing or unreadable cache file counts as a miss.
+        """
+        version = self._country_list_version()
+
+        cache = self._read_country_cache()
+        if cache and cache.get('version') == version:
+            return cache['countries']
+
+        response = self.client.table('country').select('name').order('name').execute()
+        countries = [row['name'] for row in response.data if row['name']]
+        if self.country_cache_file:
+            tmp_file = f"{self.country_cache_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({'version': version, 'countries': countries}, f)
+            os.replace(tmp_file, self.country_cache_file)
+        return countries
+
+    def _country_list_version(self):
+        """
+        Checksum of the country table from "schema design/country_version.sql".
+
+        Without that function, falls back to the row count plus the highest
+        country_id, which catches added and replaced countries but not a
+        rename in place.
+        """
+        try:
+            response = self.client.rpc('country_list_version', {}).execute()
+            return response.data[0]['version']
+        except APIError as e:
+            logger.warning(f"country_list_version unavailable ({e.message}), using count and max(country_id)")
+
+        response = self.client.table('country') \
+            .select('country_id', count='exact') \
+            .order('country_id', desc=True) \
+            .limit(1).execute()
+        max_id = response.data[0]['country_id'] if response.data else None
+        return f"{response.count}:{max_id}"
+
+    def _read_country_cache(self):
+        if not self.country_cache_file:
+            return None
+        try:
+            with open(self.country_cache_file, encoding='utf-8') as f:
+                cache = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable {self.country_cache_file}: {e}")
+            return None
+        if not isinstance(cache, dict) or not isinstance(cache.get('countries'), list):
+            return None
+        return cache
+
+    def get_top_organizations_by_ratings(self, country, limit=5):
         """Get top 5 organizations by ratings in specified country"""
-        # Verify country exists in database
-        print(f"Getting organizations for country: {country}")
-        
+        # GROUP BY runs in the database; only the top rows come back
+        try:
+            response = self.client.rpc(
+                self.top_organizations_rpc, {'country_name': country, 'max_rows': limit}
+            ).execute()
+            return response.data
+        except APIError as e:
+            logger.warning(f"{self.top_organizations_rpc} unavailable ({e.message}), aggregating client-side")
+        return self._get_top_organizations_client_side(country, limit)
+
+    def _get_top_organizations_client_side(self, country, limit=5):
+        """Fallback for databases without top_organizations.sql: downloads every user of the country."""
         users_response = self.client.table('User') \
             .select('organization, rating') \
             .eq('country', country) \
             .execute()
         
-        print(f"Found {len(users_response.data)} users in {country}")
+        logger.debug(f"Found {len(users_response.data)} users in {country}")
 
         org_ratings = {}
         for user in users_response.data:
@@ -112,10 +179,8 @@ class Queries:
             avg_rating = data['total_rating'] / data['user_count']
             avg_ratings.append({'organization': org, 'avg_rating': avg_rating})
 
-        # Sort and get top 5 organizations
-        top_orgs = sorted(avg_ratings, key=lambda x: x['avg_rating'], reverse=True)[:5]
-        print(f"Found top organizations: {top_orgs}")
-        return top_orgs
+        # Sort and get top organizations
+        return sorted(avg_ratings, key=lambda x: x['avg_rating'], reverse=True)[:limit]
 
     # Remove or comment out methods that rely on missing tables
     # def get_user_activity(self, username):
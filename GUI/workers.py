@@ -0,0 +1,94 @@
+# workers.py
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class WorkerSignals(QObject):
+    # Created on the GUI thread, so slots connected to these run there too
+    result = pyqtSignal(object)
+    error = pyqtSignal(str)
+    done = pyqtSignal()
+
+
+class QueryWorker(QRunnable):
+    """Runs one blocking call (usually a Queries method) on a pool thread."""
+
+    def __init__(self, fn, *args):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.cancelled = False
+        self.signals = WorkerSignals()
+
+    def run(self):
+        try:
+            if self.cancelled:
+                return
+            try:
+                result = self.fn(*self.args)
+            except Exception as e:
+                if not self.cancelled:
+                    self.signals.error.emit(str(e))
+                return
+            if not self.cancelled:
+                self.signals.result.emit(result)
+        finally:
+            self.signals.done.emit()
+
+
+class QueryRunner:
+    """
+    Dispatches calls to a QThreadPool and hands the results back on the GUI thread.
+
+    Every request has a key (e.g. the tab it fills). Submitting a new request
+    under a key supersedes the previous one, and cancel_all() supersedes every
+    request; superseded requests are dropped from the queue if they have not
+    started, and their results are discarded if they have. A request that is
+    already waiting on the network cannot be interrupted, only ignored.
+    """
+
+    def __init__(self, max_threads=4):
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(max_threads)
+        self.latest = {}  # key -> the worker whose result is still wanted
+        self.running = set()  # Keeps workers (and their signals) alive until they finish
+
+    def submit(self, key, fn, *args, on_result, on_error=None):
+        previous = self.latest.get(key)
+        if previous is not None:
+            self._cancel(previous)
+
+        worker = QueryWorker(fn, *args)
+        worker.setAutoDelete(False)
+        worker.signals.result.connect(lambda result: self._deliver(key, worker, on_result, result))
+        if on_error:
+            worker.signals.error.connect(lambda message: self._deliver(key, worker, on_error, message))
+        worker.signals.done.connect(lambda: self._finish(key, worker))
+
+        self.latest[key] = worker
+        self.running.add(worker)
+        self.pool.start(worker)
+        return worker
+
+    def cancel_all(self):
+        for worker in list(self.latest.values()):
+            self._cancel(worker)
+        self.latest.clear()
+
+    def wait(self, msecs=-1):
+        return self.pool.waitForDone(msecs)
+
+    def _cancel(self, worker):
+        worker.cancelled = True
+        if self.pool.tryTake(worker):
+            # Never started, so run() will not emit done
+            self.running.discard(worker)
+
+    def _deliver(self, key, worker, callback, value):
+        if self.latest.get(key) is worker and not worker.cancelled:
+            callback(value)
+
+    def _finish(self, key, worker):
+        if self.latest.get(key) is worker:
+            del self.latest[key]
+        self.running.discard(worker)
\ No newline at end of file
@@ -0,0 +1,10 @@
+-- Version stamp for Queries.get_countries (Supabase / Postgres).
+-- The GUI keeps the country list in a local cache and checks it on login with
+-- .rpc('country_list_version', {}); the checksum changes whenever a country is
+-- added, removed or renamed, so the cache is never served stale.
+CREATE OR REPLACE FUNCTION country_list_version()
+RETURNS TABLE (version TEXT)
+LANGUAGE sql STABLE AS $$
+    SELECT md5(COALESCE(string_agg(country_id::TEXT || ':' || COALESCE(name, ''), ',' ORDER BY country_id), ''))
+    FROM country;
+$$;
@@ -0,0 +1,54 @@
+-- Server-side aggregate for Queries.get_top_organizations_by_ratings (Supabase / Postgres).
+-- The client calls it with .rpc('top_organizations_by_rating', {'country_name': ..., 'max_rows': 5})
+-- and receives only the top rows instead of every (organization, rating) pair of the country.
+
+-- Lets the GROUP BY read one country's users straight from the index
+CREATE INDEX IF NOT EXISTS user_country_organization_idx
+    ON "User" (country, organization) INCLUDE (rating);
+
+-- Same rules as the old client-side loop: users without an organization are
+-- skipped and a missing rating counts as 0
+CREATE OR REPLACE FUNCTION top_organizations_by_rating(country_name TEXT, max_rows INT DEFAULT 5)
+RETURNS TABLE (organization TEXT, avg_rating DOUBLE PRECISION)
+LANGUAGE sql STABLE AS $$
+    SELECT u.organization, AVG(COALESCE(u.rating, 0))::DOUBLE PRECISION AS avg_rating
+    FROM "User" u
+    WHERE u.country = country_name
+      AND u.organization IS NOT NULL
+      AND u.organization <> ''
+    GROUP BY u.organization
+    ORDER BY avg_rating DESC, u.organization
+    LIMIT max_rows;
+$$;
+
+-- Optional precomputed variant: one row per (country, organization), rebuilt
+-- after each import with SELECT refresh_organization_rating_stats();
+CREATE MATERIALIZED VIEW IF NOT EXISTS organization_rating_stats AS
+SELECT country, organization, AVG(COALESCE(rating, 0))::DOUBLE PRECISION AS avg_rating, COUNT(*) AS user_count
+FROM "User"
+WHERE country IS NOT NULL
+  AND organization IS NOT NULL
+  AND organization <> ''
+GROUP BY country, organization;
+
+-- Unique index so the view can be refreshed CONCURRENTLY (readers are not blocked)
+CREATE UNIQUE INDEX IF NOT EXISTS organization_rating_stats_key
+    ON organization_rating_stats (country, organization);
+CREATE INDEX IF NOT EXISTS organization_rating_stats_rank
+    ON organization_rating_stats (country, avg_rating DESC);
+
+CREATE OR REPLACE FUNCTION refresh_organization_rating_stats()
+RETURNS VOID
+LANGUAGE sql AS $$
+    REFRESH MATERIALIZED VIEW CONCURRENTLY organization_rating_stats;
+$$;
+
+CREATE OR REPLACE FUNCTION top_organizations_by_rating_cached(country_name TEXT, max_rows INT DEFAULT 5)
+RETURNS TABLE (organization TEXT, avg_rating DOUBLE PRECISION)
+LANGUAGE sql STABLE AS $$
+    SELECT s.organization, s.avg_rating
+    FROM organization_rating_stats s
+    WHERE s.country = country_name
+    ORDER BY s.avg_rating DESC, s.organization
+    LIMIT max_rows;
+$$;
@@ -0,0 +1,457 @@
+"""
+Micro-benchmarks for the scraping and loading pipeline.
+
+Usage:
+    python benchmarks.py parse contests [page.html ...]
+    python benchmarks.py parse problems [page.html ...]
+    python benchmarks.py profiles [users] [server_rate]
+    python benchmarks.py profile-parse [profile.html ...]
+    python benchmarks.py rated-list [users]
+    python benchmarks.py import-users [users] [latency_ms]
+    python benchmarks.py import-all [data_dir] [latency_ms]
+    python benchmarks.py sink-failure
+
+Without fixture files, `parse` and `profile-parse` use the matching pages stored in the
+response cache (CF_CACHE_PATH, default http_cache.sqlite3).
+
+`profiles` runs the profile scraper against a local stub server that answers
+403 whenever requests exceed `server_rate` per second. `rated-list` serves a
+generated user.ratedList fixture locally and reports the peak RSS of the
+in-memory crawler and the streaming crawler without and with a response cache
+(the default configuration), each run in a fresh process.
+`import-users` loads a generated User.csv into LatencyDatabase, an in-memory
+SQLite stand-in for MySQL that sleeps `latency_ms` per round trip, with the
+row-by-row and the bulk importer. `import-all` runs populate_database.import_all
+on the CSVs in `data_dir` (default: this directory) against a file-backed
+LatencyDatabase with the tables of "schema design/", twice, to show the
+second run resuming from the progress file. `sink-failure` is a check rather
+than a benchmark: it crawls stub problemset pages into an unwritable file and
+expects fetch_problems_parallel to raise the writer's RuntimeError instead of
+hanging.
+"""
+import json
+import os
+import re
+import resource
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+from fetch_engine import AdaptiveRateLimiter
+from populate_database import TABLE_IMPORTS, bulk_import_users, import_all, import_users
+from problem_scraper import CodeforcesProblemScraper
+from response_cache import ResponseCache
+from table_parsers import BACKENDS, parse_contest_rows, parse_problem_rows
+from users_API_only import CodeforcesUserCrawler, save_to_csv, save_to_json
+from user_scraper import CodeforcesProfileScraper, _extract_profile_metrics_dom, extract_profile_metrics
+
+PROFILE_HTML = b"""<html><body><div class="_UserActivityFrame_footer">
+<div class="_UserActivityFrame_counterValue">1234 problems</div>
+<div class="_UserActivityFrame_counterDescription">solved for all time</div>
+<div class="_UserActivityFrame_counterValue">56 days</div>
+<div class="_UserActivityFrame_counterDescription">in a row max.</div>
+</div></body></html>"""
+
+
+def start_stub_server(handler_class):
+    """Serve `handler_class` on a free localhost port from a daemon thread."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler_class)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def throttling_profile_handler(server_rate):
+    """Profile pages, with a 403 for any request over `server_rate` per second."""
+    lock = threading.Lock()
+    window = []
+
+    class Handler(BaseHTTPRequestHandler):
+        forbidden = 0
+
+        def do_GET(self):
+            with lock:
+                now = time.monotonic()
+                window[:] = [t for t in window if now - t < 1]
+                allowed = len(window) < server_rate
+                window.append(now)
+                if not allowed:
+                    Handler.forbidden += 1
+            self.send_response(200 if allowed else 403)
+            self.send_header('Content-Type', 'text/html')
+            self.end_headers()
+            self.wfile.write(PROFILE_HTML if allowed else b'Forbidden')
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def load_fixtures(paths, url_pattern):
+    if paths:
+        pages = []
+        for path in paths:
+            with open(path, 'rb') as f:
+                pages.append(f.read())
+        return pages
+
+    cache = ResponseCache.from_env()
+    rows = cache.conn.execute('SELECT body FROM responses WHERE url LIKE ?', (f'%{url_pattern}%',)).fetchall()
+    cache.close()
+    return [row[0] for row in rows]
+
+
+def bench_parse(args):
+    """Rows per second of each table_parsers backend on saved pages."""
+    if not args or args[0] not in ('contests', 'problems'):
+        print("Usage: python benchmarks.py parse contests|problems [page.html ...]")
+        return
+
+    if args[0] == 'contests':
+        parse, pages = parse_contest_rows, load_fixtures(args[1:], '/contests/page/')
+    else:
+        parse, pages = parse_problem_rows, load_fixtures(args[1:], '/problemset/page/')
+    if not pages:
+        print("No fixture pages found")
+        return
+
+    print(f"{len(pages)} pages, {sum(len(p) for p in pages) / 1024:.0f} KiB")
+    expected = None
+    for backend in BACKENDS:
+        start = time.perf_counter()
+        results = [parse(page, backend) for page in pages]
+        elapsed = time.perf_counter() - start
+        rows = sum(len(page_rows) for page_rows in results)
+        print(f"{backend:>10}: {rows} rows in {elapsed:.3f}s ({rows / elapsed:,.0f} rows/s)")
+        if expected is None:
+            expected = results
+        assert results == expected, f"{backend} rows differ from {BACKENDS[0]}"
+
+
+def bench_profiles(args):
+    """Profiles/minute of a fixed-rate vs an AIMD limiter under server-side 403s."""
+    users = int(args[0]) if args else 300
+    server_rate = int(args[1]) if len(args) > 1 else 10
+
+    configs = {
+        'fixed': dict(rate=server_rate * 1.5, increase=0, decrease=1.0, cooldown=2),
+        'adaptive': dict(rate=server_rate * 1.5, increase=0.05, cooldown=2),
+    }
+    for name, limiter_args in configs.items():
+        handler = throttling_profile_handler(server_rate)
+        server, base_url = start_stub_server(handler)
+        with tempfile.TemporaryDirectory() as tmp:
+            input_file = os.path.join(tmp, 'users.csv')
+            pd.DataFrame({'username': [f"user{i}" for i in range(users)]}).to_csv(input_file, index=False)
+
+            limiter = AdaptiveRateLimiter(max_rate=server_rate * 4, **limiter_args)
+            scraper = CodeforcesProfileScraper(input_file=input_file, base_url=f"{base_url}/profile/",
+                                               limiter=limiter, retry_count=5)
+            start = time.perf_counter()
+            scraper.update_users_data()
+            elapsed = time.perf_counter() - start
+            done = int(pd.read_csv(input_file)['processed'].sum())
+        server.shutdown()
+        print(f"{name:>9}: {done}/{users} profiles in {elapsed:.1f}s ({done / elapsed * 60:,.0f}/min), "
+              f"{handler.forbidden} x 403, final rate {limiter.rate:.1f}/s")
+
+
+def bench_profile_parse(args):
+    """Per-profile CPU of the raw-bytes fast path vs the full DOM path."""
+    pages = load_fixtures(args, '/profile/') or [PROFILE_HTML]
+    repeat = max(1, 2000 // len(pages))
+
+    for name, extract in (('dom', _extract_profile_metrics_dom), ('fast', extract_profile_metrics)):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for page in pages:
+                extract(page)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>5}: {elapsed / (repeat * len(pages)) * 1e6:,.0f} us/profile")
+
+
+def file_handler(path):
+    """Serve the file at `path` for every GET, streamed in chunks."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(os.path.getsize(path)))
+            self.end_headers()
+            with open(path, 'rb') as f:
+                shutil.copyfileobj(f, self.wfile, 64 * 1024)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def write_rated_list_fixture(path, users):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{"status":"OK","result":[')
+        for i in range(users):
+            if i:
+                f.write(',')
+            json.dump({
+                'handle': f"user{i}", 'rating': 1500 + i % 1000, 'rank': 'specialist', 'maxRating': 1900,
+                'contribution': i % 50, 'organization': f"Org {i % 997}", 'friendOfCount': i % 300,
+                'registrationTimeSeconds': 1300000000 + i, 'lastOnlineTimeSeconds': 1700000000 + i,
+                'city': 'Cairo', 'country': 'Egypt'
+            }, f)
+        f.write(']}')
+
+
+def bench_rated_list(args):
+    """Peak RSS of in-memory vs streaming user.ratedList ingestion."""
+    users = int(args[0]) if args else 500000
+    with tempfile.TemporaryDirectory() as tmp:
+        fixture = os.path.join(tmp, 'ratedList.json')
+        write_rated_list_fixture(fixture, users)
+        server, base_url = start_stub_server(file_handler(fixture))
+        print(f"{users} users, fixture {os.path.getsize(fixture) / 2**20:.0f} MiB")
+
+        for mode in ('in-memory', 'stream', 'stream+cache'):
+            start = time.perf_counter()
+            output = subprocess.run(
+                [sys.executable, __file__, '_rated-list-run', mode, f"{base_url}/", tmp],
+                capture_output=True, text=True, check=True
+            ).stdout
+            elapsed = time.perf_counter() - start
+            peak_kib = int(output.strip().splitlines()[-1])
+            print(f"{mode:>9}: peak RSS {peak_kib / 1024:,.0f} MiB, {elapsed:.1f}s")
+        server.shutdown()
+
+
+def _rated_list_run(args):
+    """Child process of bench_rated_list: run one mode, print peak RSS in KiB."""
+    mode, base_url, out_dir = args
+    # stream+cache is what `python users_API_only.py` runs: a cold ResponseCache
+    cache = ResponseCache(os.path.join(out_dir, 'http_cache.sqlite3')) if mode == 'stream+cache' else None
+    crawler = CodeforcesUserCrawler(base_url=base_url, cache=cache)
+    if mode.startswith('stream'):
+        crawler.stream_user_data(os.path.join(out_dir, 'users.csv'), os.path.join(out_dir, 'users.jsonl'))
+    else:
+        user_data = crawler.get_all_user_data()
+        save_to_csv(user_data, os.path.join(out_dir, 'users.csv'))
+        save_to_json(user_data, os.path.join(out_dir, 'users.json'))
+    print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+class LatencyCursor:
+    """sqlite3 cursor that accepts the MySQL dialect used by populate_database."""
+
+    def __init__(self, cursor, db):
+        self.cursor = cursor
+        self.db = db
+
+    @staticmethod
+    def translate(query):
+        query = re.sub(r'%\((\w+)\)s', r':\1', query).replace('%s', '?')
+        query = query.replace('ON DUPLICATE KEY UPDATE', 'ON CONFLICT DO UPDATE SET')
+        return re.sub(r'VALUES\(`?(\w+)`?\)', r'excluded.\1', query)
+
+    def execute(self, query, params=()):
+        self.db.round_trip()
+        self.cursor.execute(self.translate(query), params)
+
+    def executemany(self, query, rows):
+        # mysql.connector sends an executemany INSERT as one multi-row statement
+        self.db.round_trip()
+        self.cursor.executemany(self.translate(query), rows)
+
+    def fetchone(self):
+        return self.cursor.fetchone()
+
+    def fetchall(self):
+        return self.cursor.fetchall()
+
+    @property
+    def lastrowid(self):
+        return self.cursor.lastrowid
+
+    def close(self):
+        self.cursor.close()
+
+
+class LatencyDatabase:
+    """
+    SQLite stand-in for the MySQL connection, `latency` seconds per round trip.
+
+    The tables follow "schema design/" (SQL.sql and the entity diagram). Pass
+    a file `path` to share one database between several connections.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS country (country_id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE);
+        CREATE TABLE IF NOT EXISTS organization (organization_id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE);
+        CREATE TABLE IF NOT EXISTS user (
+            user_id INTEGER PRIMARY KEY AUTOINCREMENT, screen_name TEXT UNIQUE, city TEXT,
+            country_id INTEGER, organization_id INTEGER, contribution INTEGER, friend_count INTEGER,
+            registration_date TEXT, problems_solved INTEGER, max_streak INTEGER, rating INTEGER, max_rating INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS contest (
+            contest_id INTEGER PRIMARY KEY, name TEXT, date TEXT, division TEXT, participants INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS problem (
+            problem_id TEXT PRIMARY KEY, name TEXT, time_limit REAL, memory_limit INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS tag (tag_id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT);
+        CREATE TABLE IF NOT EXISTS contestwriter (
+            contest_id INTEGER, user_id INTEGER, PRIMARY KEY (contest_id, user_id)
+        );
+        CREATE TABLE IF NOT EXISTS problemtag (
+            problem_id TEXT, tag_id INTEGER, PRIMARY KEY (problem_id, tag_id)
+        );
+    """
+
+    def __init__(self, latency=0.001, path=':memory:'):
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=60)
+        self.conn.executescript(self.SCHEMA)
+        self.latency = latency
+        self.round_trips = 0
+
+    def round_trip(self):
+        self.round_trips += 1
+        time.sleep(self.latency)
+
+    def cursor(self):
+        return LatencyCursor(self.conn.cursor(), self)
+
+    def commit(self):
+        self.round_trip()
+        self.conn.commit()
+
+    def rollback(self):
+        self.conn.rollback()
+
+    def close(self):
+        pass
+
+    def count(self, table):
+        return self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def write_users_fixture(path, users):
+    pd.DataFrame({
+        'username': [f"user{i}" for i in range(users)],
+        'rating': [1200 + i % 2000 for i in range(users)],
+        'rank': 'expert',
+        'max_rating': [1500 + i % 2000 for i in range(users)],
+        'contribution': [i % 50 for i in range(users)],
+        'organization': [f"Org {i % 997}" if i % 3 else None for i in range(users)],
+        'friend_count': [i % 300 for i in range(users)],
+        'registration_date': '2015-06-01',
+        'city': 'Cairo',
+        'country': [f"Country {i % 150}" if i % 4 else None for i in range(users)],
+        'max_streak': [i % 40 for i in range(users)],
+        'problems_solved': [i % 900 for i in range(users)],
+        'processed': 'True'
+    }).to_csv(path, index=False, quotechar="'", escapechar='\\')
+
+
+def bench_import_users(args):
+    """Rows/second of the row-by-row vs the bulk User.csv import against a high-latency database."""
+    users = int(args[0]) if args else 5000
+    latency = float(args[1]) / 1000 if len(args) > 1 else 0.001
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'User.csv')
+        write_users_fixture(path, users)
+
+        for name, importer in (('row-by-row', import_users), ('bulk', bulk_import_users)):
+            db = LatencyDatabase(latency)
+            start = time.perf_counter()
+            importer(path, conn=db)
+            elapsed = time.perf_counter() - start
+            loaded = db.count('user')
+            print(f"{name:>10}: {loaded}/{users} users in {elapsed:.1f}s ({loaded / elapsed:,.0f} rows/s), "
+                  f"{db.round_trips} round trips, {db.count('country')} countries, {db.count('organization')} organizations")
+
+
+def bench_import_all(args):
+    """Full import_all run against the schema tables, then a second, resumed run."""
+    data_dir = args[0] if args else os.path.dirname(os.path.abspath(__file__))
+    latency = float(args[1]) / 1000 if len(args) > 1 else 0.001
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'codeforces.sqlite3')
+        progress_file = os.path.join(tmp, 'import_progress.json')
+        for run in ('first', 'resumed'):
+            start = time.perf_counter()
+            ok = import_all(data_dir, progress_file=progress_file, connect=lambda: LatencyDatabase(latency, path))
+            elapsed = time.perf_counter() - start
+            print(f"{run} run: {'ok' if ok else 'FAILED'} in {elapsed:.1f}s")
+
+        db = LatencyDatabase(0, path)
+        for name, spec in TABLE_IMPORTS.items():
+            print(f"{spec['table']:>14}: {db.count(spec['table'])} rows")
+        db.conn.close()
+
+
+PROBLEMSET_HTML = b"""<html><body><table class="problems">
+<tr><th>#</th><th>Name</th></tr>
+<tr><td><a href="/problemset/problem/1/A">1A</a></td><td><div><a>Theatre Square</a></div>
+<a class="notice">math</a></td><td><span class="ProblemRating">1000</span></td></tr>
+</table></body></html>"""
+
+
+def bench_sink_failure(args):
+    """A writer that cannot open its file must end the crawl with its error, not hang it."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.end_headers()
+            self.wfile.write(PROBLEMSET_HTML)
+
+        def log_message(self, *args):
+            pass
+
+    server, base_url = start_stub_server(Handler)
+    outcome = []
+
+    def crawl():
+        scraper = CodeforcesProblemScraper(base_url=base_url, rate=50, max_workers=4, parse_workers=2)
+        try:
+            scraper.fetch_problems_parallel(os.path.join(tempfile.gettempdir(), 'missing-dir', 'out.csv'), use_api=False)
+            outcome.append(None)
+        except Exception as e:
+            outcome.append(e)
+
+    crawler = threading.Thread(target=crawl, daemon=True)
+    crawler.start()
+    crawler.join(timeout=60)
+    server.shutdown()
+    if not outcome:
+        print("FAILED: the crawl hung")
+        sys.exit(1)
+    if not isinstance(outcome[0], RuntimeError):
+        print(f"FAILED: expected RuntimeError, got {outcome[0]!r}")
+        sys.exit(1)
+    print(f"ok: {outcome[0]}")
+
+
+BENCHMARKS = {
+    'parse': bench_parse,
+    'profiles': bench_profiles,
+    'profile-parse': bench_profile_parse,
+    'rated-list': bench_rated_list,
+    '_rated-list-run': _rated_list_run,
+    'import-users': bench_import_users,
+    'import-all': bench_import_all,
+    'sink-failure': bench_sink_failure,
+}
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print(__doc__)
+        sys.exit(1)
+    BENCHMARKS[sys.argv[1]](sys.argv[2:])
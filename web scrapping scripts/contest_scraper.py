@@ -1,30 +1,45 @@
-import requests
-from bs4 import BeautifulSoup
+import asyncio
+import itertools
 import csv
+import json
 import re
-import time
-import random
 import os
 import sys
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from collections import OrderedDict
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 import pandas as pd
-from queue import Queue
 from threading import Lock
 import logging
+from fetch_engine import FetchEngine
+from page_pipeline import run_page_pipeline
+from response_cache import ResponseCache
+from scrape_state import ScrapeState
+from table_parsers import DEFAULT_BACKEND, parse_contest_rows
+from typed_csv import read_table
+
+MOSCOW_TZ = ZoneInfo('Europe/Moscow')
+# The 'contest_writers' ScrapeState section remembers writer lookups so each
+# contest page is fetched once: 'checked' lists finished contests whose page has
+# no writers, 'retry' maps contest_id -> failed attempts (0 for unfinished
+# contests). Retries stop after MAX_WRITER_ATTEMPTS runs.
+MAX_WRITER_ATTEMPTS = 3
 
 class CodeforcesScraper:
-    def __init__(self, start_page=1, max_workers=None):
-        self.session = requests.Session()
-        self.headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-        }
-        self.base_url = 'https://codeforces.com'
+    def __init__(self, start_page=1, max_workers=None, rate=2.0, base_url='https://codeforces.com', cache=None, max_pages=None,
+                 parser_backend=DEFAULT_BACKEND, parse_workers=None):
+        self.engine = None
+        self.cache = cache  # Optional ResponseCache shared across runs
+        self.base_url = base_url
         self.start_page = start_page
-        self.max_workers = max_workers or min(32, os.cpu_count() + 4)  # Python's recommendation for I/O bound tasks
+        self.max_pages = max_pages  # None crawls until the listing runs out
+        self.max_workers = max_workers or min(32, os.cpu_count() + 4)  # Pages allowed in flight at once
+        self.rate = rate  # Requests per second shared by all in-flight pages
+        self.parser_backend = parser_backend  # See table_parsers.BACKENDS
+        self.parse_workers = parse_workers or os.cpu_count()  # Processes running the CPU-bound parsing
         self.print_lock = Lock()
-        self.data_lock = Lock()
-        self.contest_queue = Queue()
         
         # Setup logging
         logging.basicConfig(
@@ -41,116 +56,233 @@ class CodeforcesScraper:
         with self.print_lock:
             self.logger.info(message)
 
-    def fetch_page_data(self, page_url, retries=3):
-        for attempt in range(retries):
+    async def fetch_page_data(self, page_url):
+        content = await self.engine.fetch(page_url)
+        if content is None:
+            self.safe_print(f"Giving up on {page_url}")
+        return content
+
+    async def fetch_page(self, page):
+        self.safe_print(f"Processing page {page}...")
+        return await self.fetch_page_data(f"{self.base_url}/contests/page/{page}")
+
+    async def _fetch_contests(self, emit_rows, after_contest_id=None):
+        """
+        Crawl contest pages through a bounded two-stage pipeline.
+
+        `max_workers` coroutines download pages and `parse_workers` processes
+        parse them (see page_pipeline.run_page_pipeline). Rows are passed to
+        `emit_rows` exactly once, as soon as their page is parsed. Scheduling
+        stops at the first page that yields no new contests (Codeforces serves
+        the last page again for out-of-range page numbers, so "nothing new" is
+        treated the same as "empty"). With `after_contest_id` (a refresh), only
+        newer contests are emitted and the crawl also stops at the first page
+        made entirely of contests at or below that id.
+        """
+        seen = set()
+        pages = itertools.count(self.start_page)
+        if self.max_pages is not None:
+            pages = range(self.start_page, self.max_pages + 1)
+
+        def handle_page(page, contests):
+            new_contests = []
+            for contest in contests:
+                key = contest['contest_id'] or contest['contest_name']
+                if after_contest_id is not None and not is_newer_contest(contest, after_contest_id):
+                    continue
+                if key not in seen:
+                    seen.add(key)
+                    new_contests.append(contest)
+
+            if not new_contests:
+                self.safe_print(f"Page {page} has no new contests, stopping")
+                return False
+
+            emit_rows(new_contests)
+            self.safe_print(f"Added {len(new_contests)} contests from page {page}")
+            return True
+
+        async with FetchEngine(rate=self.rate, max_connections=self.max_workers, cache=self.cache) as engine:
+            self.engine = engine
+            with ProcessPoolExecutor(max_workers=self.parse_workers) as parse_pool:
+                await run_page_pipeline(
+                    pages, self.fetch_page, partial(parse_contest_rows, backend=self.parser_backend), handle_page,
+                    fetch_workers=self.max_workers, parse_pool=parse_pool, parse_workers=self.parse_workers
+                )
+            self.engine = None
+
+        return len(seen)
+
+    async def fetch_contest_page(self, contest_id):
+        return await self.fetch_page_data(f"{self.base_url}/contests/{contest_id}")
+
+    async def _fetch_contests_api(self, emit_rows, writers_file, after_contest_id=None, writer_state=None,
+                                  contest_state=None):
+        """
+        Load contest metadata from one contest.list call and fill in writers.
+
+        Only contests with no entry in `writers_file` that `writer_state` has
+        not settled get their /contests/<id> page fetched. Returns None when
+        the API is unavailable; with `after_contest_id` only newer contests,
+        contests whose writers were just found and contests that were not
+        finished at the last run (listed in `contest_state`) are emitted.
+        """
+        known_writers = load_contest_writers(writers_file)
+        writer_state = writer_state if writer_state is not None else {}
+        checked = set(writer_state.get('checked', []))
+        retry = writer_state.setdefault('retry', {})
+
+        def wants_writers(contest_id):
+            if contest_id in known_writers or contest_id in checked:
+                return False
+            if contest_id in retry:
+                return retry[contest_id] < MAX_WRITER_ATTEMPTS
+            # On a refresh, older contests were all handled by earlier runs
+            return after_contest_id is None or int(contest_id) > after_contest_id
+
+        async with FetchEngine(rate=self.rate, max_connections=self.max_workers, cache=self.cache) as engine:
+            self.engine = engine
+            content = await engine.fetch(f"{self.base_url}/api/contest.list", params={'gym': 'false'})
+            if content is None:
+                return None
             try:
-                time.sleep(random.uniform(1.5, 2.5))
-                response = self.session.get(page_url, headers=self.headers, timeout=15)
-                response.raise_for_status()
-                return BeautifulSoup(response.content, 'html.parser')
-            except requests.RequestException as e:
-                self.safe_print(f"Error fetching {page_url} (attempt {attempt + 1}/{retries}): {e}")
-                if attempt == retries - 1:
-                    return None
-                time.sleep(5)
-        return None
-
-    def extract_contest_data(self, row):
-        try:
-            name_cell = row.find('td', class_=None)
-            if not name_cell:
+                data = json.loads(content)
+            except ValueError as e:
+                # e.g. an HTML challenge page served with a 200
+                self.safe_print(f"contest.list returned invalid JSON: {e}")
                 return None
-            
-            contest_name = name_cell.get_text(strip=True)
-            contest_link = name_cell.find('a')
-            contest_id = ''
-            if contest_link and 'href' in contest_link.attrs:
-                contest_id = contest_link['href'].split('/')[-1]
-                if not contest_id.isdigit():
-                    contest_id = ''
-
-            writers_cell = row.find_all('td')[1] if len(row.find_all('td')) > 1 else None
-            writers = []
-            if writers_cell:
-                writer_links = writers_cell.find_all('a')
-                writers = [w.get_text(strip=True) for w in writer_links]
-            writers_str = ', '.join(writers)
-
-            start_cell = row.find_all('td')[2] if len(row.find_all('td')) > 2 else None
-            start_time = ''
-            if start_cell:
-                start_time = start_cell.get_text(strip=True)
-
-            length_cell = row.find_all('td')[3] if len(row.find_all('td')) > 3 else None
-            length = length_cell.get_text(strip=True) if length_cell else ''
-
-            return {
-                'contest_id': contest_id,
-                'contest_name': contest_name,
-                'writers': writers_str,
-                'start_time': start_time,
-                'length': length
-            }
-        except Exception as e:
-            self.safe_print(f"Error extracting contest data: {e}")
-            return None
-
-    def process_page(self, page):
-        self.safe_print(f"Processing page {page}...")
-        soup = self.fetch_page_data(f"{self.base_url}/contests/page/{page}")
-        if not soup:
-            return [], False
-
-        page_contests = []
-        tables = soup.find_all('table', class_='')
-        if not tables:
-            return [], False
-
-        for table in tables:
-            rows = table.find_all('tr')[1:]
-            for row in rows:
-                contest_data = self.extract_contest_data(row)
-                if contest_data:
-                    page_contests.append(contest_data)
-
-        return page_contests, bool(page_contests)
-
-    def fetch_contests_parallel(self):
-        all_contests = []
-        futures = []
-
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            page = self.start_page
-            active_pages = set()
-            
-            while page <= 50:  # Adjust max pages as needed
-                futures.append(executor.submit(self.process_page, page))
-                active_pages.add(page)
-                page += 1
-
-                # Process completed futures
-                for future in as_completed(futures):
-                    contests, has_contests = future.result()
-                    if contests:
-                        with self.data_lock:
-                            all_contests.extend(contests)
-                            self.safe_print(f"Added {len(contests)} contests from page")
-
-        return all_contests
-
-def clean_duplicates(input_file='contests.csv', output_file='contests_cleaned.csv'):
+            if data.get('status') != 'OK':
+                self.safe_print(f"contest.list failed: {data.get('comment')}")
+                return None
+
+            contests = data['result']
+            finished = {str(c['id']) for c in contests if c.get('phase') == 'FINISHED'}
+            missing = [str(c['id']) for c in contests if wants_writers(str(c['id']))]
+            self.safe_print(f"{len(contests)} contests from the API, fetching writers for {len(missing)}")
+
+            new_writers = {}
+            for contest_id in missing:
+                # Pages the pipeline never gets to (it stops after repeated failures) are retried next run
+                retry.setdefault(contest_id, 0)
+
+            async def fetch_writers_page(contest_id):
+                # Counted up front so a failed fetch or parse is remembered; a handled page clears it
+                retry[contest_id] += 1
+                return await self.fetch_contest_page(contest_id)
+
+            def handle_page(contest_id, rows):
+                for row in rows:
+                    if row['contest_id'] == contest_id and row['writers']:
+                        new_writers[contest_id] = row['writers'].split(', ')
+                if contest_id in new_writers or contest_id in finished:
+                    del retry[contest_id]
+                    if contest_id not in new_writers:
+                        checked.add(contest_id)
+                else:
+                    # Writers may still be announced before the contest ends
+                    retry[contest_id] = 0
+                return True
+
+            with ProcessPoolExecutor(max_workers=self.parse_workers) as parse_pool:
+                await run_page_pipeline(
+                    missing, fetch_writers_page, partial(parse_contest_rows, backend=self.parser_backend),
+                    handle_page, fetch_workers=self.max_workers, parse_pool=parse_pool, parse_workers=self.parse_workers
+                )
+            self.engine = None
+
+        writer_state['checked'] = sorted(checked, key=int)
+        if new_writers:
+            write_header = not os.path.exists(writers_file)
+            with open(writers_file, 'a', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                if write_header:
+                    writer.writerow(['contest_id', 'username'])
+                for contest_id, usernames in new_writers.items():
+                    writer.writerows((contest_id, username) for username in usernames)
+            known_writers.update(new_writers)
+
+        contest_state = contest_state if contest_state is not None else {}
+        unfinished = {str(c['id']) for c in contests if c.get('phase') != 'FINISHED'}
+        # Their name, start time and length may still change
+        changing = unfinished | set(contest_state.get('unfinished', []))
+        contest_state['unfinished'] = sorted(unfinished, key=int)
+
+        rows = [api_contest_row(contest, known_writers.get(str(contest['id']), [])) for contest in contests]
+        if after_contest_id is not None:
+            # Older contests whose writers were only found now (from 'retry') are
+            # emitted too, so merge_existing fills in their writers
+            rows = [row for row in rows if is_newer_contest(row, after_contest_id)
+                    or row['contest_id'] in new_writers or row['contest_id'] in changing]
+        emit_rows(rows)
+        return len(rows)
+
+    def fetch_contests_parallel(self, output_file='contests_raw.csv', use_api=True, writers_file='contestWriters.csv',
+                                after_contest_id=None, writer_state=None, contest_state=None):
+        """
+        Fetch every contest into `output_file`.
+
+        By default contest metadata comes from the contest.list API and only
+        contests with unknown writers cost an HTML request; the paged HTML
+        crawl is used if the API fails or `use_api` is False. Pass the stored
+        high-water mark as `after_contest_id` to fetch only newer contests,
+        and the 'contest_writers' ScrapeState section as `writer_state` so
+        contest pages already checked for writers are not fetched again. The
+        'contests' section, as `contest_state`, remembers which contests were
+        not finished yet so a refresh updates them too.
+        """
+        with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
+            fieldnames = ['contest_id', 'contest_name', 'writers', 'start_time', 'length']
+            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+            writer.writeheader()
+
+            if use_api:
+                count = asyncio.run(self._fetch_contests_api(writer.writerows, writers_file, after_contest_id,
+                                                             writer_state, contest_state))
+                if count is not None:
+                    return count
+                self.safe_print("Falling back to scraping the HTML contest pages")
+            return asyncio.run(self._fetch_contests(writer.writerows, after_contest_id))
+
+def is_newer_contest(contest, after_contest_id):
+    return contest['contest_id'].isdigit() and int(contest['contest_id']) > after_contest_id
+
+def load_contest_writers(path='contestWriters.csv'):
+    """Map contest_id -> list of writer handles from a contestWriters CSV."""
+    writers = {}
+    if os.path.exists(path):
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                writers.setdefault(row['contest_id'], []).append(row['username'])
+    return writers
+
+def api_contest_row(contest, writers):
+    """Turn a contest.list entry into a contests CSV row (times in Moscow time, as on the site)."""
+    start_time = ''
+    if 'startTimeSeconds' in contest:
+        start_time = datetime.fromtimestamp(contest['startTimeSeconds'], MOSCOW_TZ).strftime('%Y-%m-%d %H:%M:%S')
+    hours, remainder = divmod(contest.get('durationSeconds', 0), 3600)
+    return {
+        'contest_id': str(contest['id']),
+        'contest_name': contest['name'],
+        'writers': ', '.join(writers),
+        'start_time': start_time,
+        'length': f"{hours:02d}:{remainder // 60:02d}:{remainder % 60:02d}"
+    }
+
+def clean_duplicates(input_file='contests.csv', output_file='contests_cleaned.csv', merge_existing=False):
     """
     Clean duplicates from the contests CSV file using pandas for efficient processing.
+
+    With merge_existing=True the rows already in output_file are kept and the
+    new rows from input_file are merged in (new data wins on duplicates).
     """
-    # Read the CSV file
-    df = pd.read_csv(input_file)
-    
-    # Convert empty strings to NaN for better handling
-    df = df.replace('', pd.NA)
+    # Read the CSV file (contest_id as Int64, empty cells as <NA>)
+    df = read_table(input_file, 'contests')
+    if merge_existing and os.path.exists(output_file):
+        df = pd.concat([df, read_table(output_file, 'contests')], ignore_index=True)
     
-    # Sort by contest_id (ensuring numeric sorting)
-    df['contest_id'] = pd.to_numeric(df['contest_id'], errors='coerce')
-    df = df.sort_values('contest_id', ascending=False)
+    # Sort by contest_id
+    df = df.sort_values('contest_id', ascending=False, kind='stable')
     
     # Drop duplicates based on contest_id, keeping the first occurrence (latest data)
     df_cleaned = df.drop_duplicates(subset=['contest_id'], keep='first')
@@ -168,10 +300,7 @@ def clean_duplicates(input_file='contests.csv', output_file='contests_cleaned.cs
     # Sort by contest_id again
     df_final = df_final.sort_values('contest_id', ascending=False)
     
-    # Replace NaN back to empty strings
-    df_final = df_final.fillna('')
-    
-    # Save to new CSV file
+    # Save to new CSV file (<NA> is written as an empty cell)
     df_final.to_csv(output_file, index=False)
     
     # Print statistics
@@ -185,20 +314,24 @@ def main():
     # Parse command line arguments
     start_page = int(sys.argv[1]) if len(sys.argv) > 1 else 1
     max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    rate = float(sys.argv[3]) if len(sys.argv) > 3 else 2.0
     
     # Initialize and run the scraper
-    scraper = CodeforcesScraper(start_page=start_page, max_workers=max_workers)
-    contests = scraper.fetch_contests_parallel()
-    
-    # Save raw data
-    with open('contests_raw.csv', 'w', newline='', encoding='utf-8') as csvfile:
-        fieldnames = ['contest_id', 'contest_name', 'writers', 'start_time', 'length']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(contests)
+    scraper = CodeforcesScraper(start_page=start_page, max_workers=max_workers, rate=rate,
+                                 cache=ResponseCache.from_env())
+    # Refresh from the stored high-water mark when there is a cleaned file to merge into
+    state = ScrapeState()
+    contest_state = state.get('contests')
+    after_contest_id = contest_state.get('max_contest_id') if os.path.exists('contests_cleaned.csv') else None
+    scraper.fetch_contests_parallel('contests_raw.csv', after_contest_id=after_contest_id,
+                                    writer_state=state.get('contest_writers'), contest_state=contest_state)
     
     # Clean duplicates
-    clean_duplicates('contests_raw.csv', 'contests_cleaned.csv')
+    df = clean_duplicates('contests_raw.csv', 'contests_cleaned.csv', merge_existing=after_contest_id is not None)
+    max_contest_id = df['contest_id'].max()
+    if pd.notna(max_contest_id):
+        contest_state['max_contest_id'] = int(max_contest_id)
+    state.save()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
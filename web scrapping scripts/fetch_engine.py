@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import time
+from threading import Lock
+
+import aiohttp
+
+from response_cache import cache_key
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+}
+
+
+class TokenBucket:
+    """Token-bucket rate limiter shared by every request of a FetchEngine."""
+
+    def __init__(self, rate=2.0, capacity=1):
+        self.rate = rate  # tokens added per second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self):
+        """Wait until a token is available and take it."""
+        # The lock makes waiters queue up in FIFO order, so the bucket hands
+        # out tokens at exactly `rate` per second no matter how many
+        # coroutines are waiting.
+        async with self.lock:
+            self._refill()
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+
+class AdaptiveRateLimiter:
+    """
+    Thread-safe AIMD rate limiter for the synchronous scrapers.
+
+    acquire() spaces requests 1/rate seconds apart across all threads. Every
+    success raises the rate by `increase` (additive increase, up to
+    `max_rate`); a 403/429 halves it (multiplicative decrease, down to
+    `min_rate`) and pauses every thread for `cooldown` seconds. Throttles that
+    arrive during a cooldown belong to the same burst and are not counted
+    again, so one burst of 403s halves the rate once rather than collapsing it.
+    """
+
+    def __init__(self, rate=0.5, min_rate=0.05, max_rate=5.0, increase=0.01, decrease=0.5, cooldown=30):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.next_slot = time.monotonic()
+        self.paused_until = 0
+        self.throttles = 0
+        self.lock = Lock()
+
+    def acquire(self):
+        """Block until this thread may send its next request."""
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot, self.paused_until)
+            self.next_slot = slot + 1 / self.rate
+        time.sleep(max(0, slot - now))
+
+    def on_success(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self):
+        with self.lock:
+            now = time.monotonic()
+            if now < self.paused_until:
+                return
+            self.throttles += 1
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self.paused_until = now + self.cooldown
+            self.next_slot = self.paused_until
+
+
+class FetchEngine:
+    """
+    Asyncio HTTP client used by the scrapers.
+
+    All requests share one keep-alive connection pool and one TokenBucket, so
+    the request rate is `rate` per second regardless of how many pages are in
+    flight at once. With a ResponseCache, fresh pages are served from disk
+    without spending a token and stale ones are revalidated conditionally.
+    Use it as an async context manager:
+
+        async with FetchEngine(rate=2.0) as engine:
+            body = await engine.fetch('https://codeforces.com/contests/page/1')
+    """
+
+    def __init__(self, rate=2.0, burst=1, max_connections=8, headers=None, timeout=15, retries=3, retry_delay=5, cache=None):
+        self.cache = cache
+        self.limiter = TokenBucket(rate=rate, capacity=burst)
+        self.max_connections = max_connections
+        self.headers = headers or DEFAULT_HEADERS
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.session = None
+        self.logger = logging.getLogger(__name__)
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=30)
+        self.session = aiohttp.ClientSession(connector=connector, headers=self.headers, timeout=self.timeout)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.session.close()
+        self.session = None
+
+    async def fetch(self, url, params=None):
+        """
+        Return the response body as bytes, or None once all retries failed.
+
+        Only 5xx, 429, timeouts and connection errors are retried. Any other
+        4xx is final: a JSON body (the API's FAILED status with its comment)
+        is returned uncached, anything else gives None right away.
+        """
+        key = cache_key(url, params)
+        entry = self.cache.get(key) if self.cache else None
+        if entry is not None and self.cache.is_fresh(key, entry):
+            return entry.body
+        if self.cache and self.cache.offline:
+            self.logger.info(f"Cache-only mode: no cached response for {key}")
+            return None
+
+        headers = self.cache.validators(entry) if self.cache else None
+        for attempt in range(self.retries):
+            try:
+                await self.limiter.acquire()
+                async with self.session.get(url, params=params, headers=headers) as response:
+                    if response.status == 304 and entry is not None:
+                        self.cache.touch(key)
+                        return entry.body
+                    if 400 <= response.status < 500 and response.status != 429:
+                        self.logger.info(f"Error fetching {url}: HTTP {response.status}, not retrying")
+                        return await response.read() if response.content_type == 'application/json' else None
+                    response.raise_for_status()
+                    body = await response.read()
+                    if self.cache:
+                        self.cache.store(key, body, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+                    return body
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self.logger.info(f"Error fetching {url} (attempt {attempt + 1}/{self.retries}): {e}")
+                if attempt == self.retries - 1:
+                    return None
+                await asyncio.sleep(self.retry_delay)
+        return None
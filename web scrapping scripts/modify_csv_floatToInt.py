@@ -1,22 +1,19 @@
-import csv
+import sys
 
-def process_csv(input_file, output_file):
-    with open(input_file, mode='r', newline='', encoding='utf-8') as infile, \
-         open(output_file, mode='w', newline='', encoding='utf-8') as outfile:
-        
-        reader = csv.reader(infile)
-        writer = csv.writer(outfile)
-        
-        # Read header
-        headers = next(reader)
-        writer.writerow(headers)
-        
-        for row in reader:
-            if row[0].endswith('.0'):
-                row[0] = str(int(float(row[0])))
-            writer.writerow(row)
+from typed_csv import read_table
+
+def process_csv(input_file, output_file, table='contests'):
+    """
+    Rewrite a CSV exported before the loaders kept ids as Int64, turning '1.0' back into '1'.
+
+    Files written by the current scrapers need no fixing; read_table already
+    coerces float-formatted ids when they are loaded.
+    """
+    df = read_table(input_file, table)
+    df.to_csv(output_file, index=False)
 
 if __name__ == "__main__":
-    input_file = 'contests_cleaned.csv'
-    output_file = 'contests_cleaned2.csv'
-    process_csv(input_file, output_file)
\ No newline at end of file
+    input_file = sys.argv[1] if len(sys.argv) > 1 else 'contests_cleaned.csv'
+    output_file = sys.argv[2] if len(sys.argv) > 2 else 'contests_cleaned2.csv'
+    table = sys.argv[3] if len(sys.argv) > 3 else 'contests'
+    process_csv(input_file, output_file, table)
\ No newline at end of file
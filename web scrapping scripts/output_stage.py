@@ -0,0 +1,154 @@
+import asyncio
+import csv
+import logging
+import os
+from queue import Full, Queue
+from threading import Thread
+
+logger = logging.getLogger(__name__)
+
+
+class QueuedWriter:
+    """
+    A bounded queue drained by one background writer thread.
+
+    Subclasses implement `_run`, which takes items off `self.queue` until
+    CLOSE and runs (CHECKPOINT, callback) items once everything before them
+    is written. If the writer thread dies, its exception is re-raised by the
+    next put, checkpoint or close instead of leaving producers blocked on a
+    full queue. Coroutines should use `put_async`, which waits for queue
+    space in a worker thread rather than on the event loop.
+    """
+
+    CLOSE = object()
+    CHECKPOINT = object()
+
+    def __init__(self, name, queue_size):
+        self.queue = Queue(maxsize=queue_size)
+        self.error = None
+        self.thread = Thread(target=self._run_checked, name=name, daemon=True)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def start(self):
+        self.thread.start()
+
+    def put(self, rows):
+        """Queue a list of row dicts for writing."""
+        if rows:
+            self._enqueue(rows)
+
+    async def put_async(self, rows):
+        await asyncio.to_thread(self.put, rows)
+
+    def checkpoint(self, callback):
+        self._enqueue((self.CHECKPOINT, callback))
+
+    def close(self):
+        """Flush everything that was queued and wait for the writer thread."""
+        self._enqueue(self.CLOSE)
+        self.thread.join()
+        self._raise_error()
+
+    def _enqueue(self, item, poll=0.5):
+        while True:
+            self._raise_error()
+            try:
+                self.queue.put(item, timeout=poll)
+                return
+            except Full:
+                continue
+
+    def _raise_error(self):
+        if self.error is not None:
+            raise RuntimeError(f"{self.thread.name} stopped: {self.error}") from self.error
+
+    def _run_checked(self):
+        try:
+            self._run()
+        except BaseException as e:
+            logger.error(f"{self.thread.name} failed: {e}")
+            self.error = e
+
+    def _run(self):
+        raise NotImplementedError
+
+
+class DedupCsvWriter(QueuedWriter):
+    """
+    Single-writer CSV output stage.
+
+    Producers hand lists of row dicts to `put`; one background thread owns
+    the file, drops rows whose `key` column has already been written, and
+    writes the rest in batches through a large write buffer. Because the
+    seen-set is checked on write, the output never contains duplicates and
+    needs no cleaning pass afterwards. The queue is bounded, so a slow disk
+    applies backpressure to the producers instead of growing memory (see
+    QueuedWriter).
+
+    With `append=True` an existing file is extended and its keys seed the
+    seen-set, so rows that are already in the file are not written again.
+    `checkpoint(callback)` runs `callback` on the writer thread once every
+    row queued before it has been written and flushed.
+    """
+
+    def __init__(self, path, fieldnames, key, append=False, batch_size=1000, buffer_size=1024 * 1024, queue_size=64):
+        self.path = path
+        self.fieldnames = fieldnames
+        self.key = key
+        self.append = append and os.path.exists(path)
+        self.batch_size = batch_size
+        self.buffer_size = buffer_size
+        self.seen = set()
+        self.written = 0
+        self.duplicates = 0
+        super().__init__(f"writer-{os.path.basename(path)}", queue_size)
+
+    def start(self):
+        if self.append:
+            with open(self.path, newline='', encoding='utf-8') as f:
+                self.seen.update(row[self.key] for row in csv.DictReader(f))
+        super().start()
+
+    def close(self):
+        super().close()
+        logger.info(f"{self.path}: wrote {self.written} rows, dropped {self.duplicates} duplicates")
+
+    def _run(self):
+        mode = 'a' if self.append else 'w'
+        with open(self.path, mode, newline='', encoding='utf-8', buffering=self.buffer_size) as f:
+            writer = csv.DictWriter(f, fieldnames=self.fieldnames)
+            if not self.append:
+                writer.writeheader()
+
+            batch = []
+            while True:
+                rows = self.queue.get()
+                if rows is self.CLOSE:
+                    break
+                if isinstance(rows, tuple) and rows[0] is self.CHECKPOINT:
+                    writer.writerows(batch)
+                    self.written += len(batch)
+                    batch = []
+                    f.flush()
+                    rows[1]()
+                    continue
+                for row in rows:
+                    row_key = str(row[self.key])  # Keys read back from an appended file are strings
+                    if row_key in self.seen:
+                        self.duplicates += 1
+                        continue
+                    self.seen.add(row_key)
+                    batch.append(row)
+                if len(batch) >= self.batch_size:
+                    writer.writerows(batch)
+                    self.written += len(batch)
+                    batch = []
+
+            writer.writerows(batch)
+            self.written += len(batch)
@@ -0,0 +1,104 @@
+import asyncio
+import inspect
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+async def run_page_pipeline(pages, fetch, parse, handle, fetch_workers, parse_pool, parse_workers, queue_size=None,
+                            max_failures=3):
+    """
+    Fetch and parse listing pages in two stages.
+
+    `fetch_workers` coroutines download pages (page keys come from the
+    `pages` iterable, which may be endless) and push the raw bytes into a
+    bounded queue. `parse_workers` consumers run `parse(content)` in
+    `parse_pool` (a ProcessPoolExecutor, so parsing uses every core) and pass
+    the rows to `handle(page, rows)` on the event loop (`handle` may be a
+    coroutine function, e.g. to await a writer's put_async). When it returns
+    False no further pages are scheduled, and pages scheduled after that one
+    are dropped; pages scheduled before it are still fetched, parsed and
+    handled, since they can finish in any order. The queues hold at most
+    `queue_size` pages each, which keeps memory flat when parsing falls
+    behind the network or the other way round. Pages whose fetch fails are
+    skipped; after `max_failures` failures in a row scheduling stops too, so an
+    endless `pages` iterable cannot spin forever (e.g. in cache-only mode).
+    If `fetch` or `handle` raises, every other stage is cancelled and the
+    exception is re-raised to the caller.
+    """
+    queue_size = queue_size or fetch_workers
+    page_keys = asyncio.Queue(maxsize=queue_size)
+    raw_pages = asyncio.Queue(maxsize=queue_size)
+    stop_at = None  # Position (in `pages` order) of the page that stopped the crawl
+    failures = 0
+    loop = asyncio.get_running_loop()
+
+    def stop(position):
+        nonlocal stop_at
+        stop_at = position if stop_at is None else min(stop_at, position)
+
+    def dropped(position):
+        return stop_at is not None and position > stop_at
+
+    async def producer():
+        for position, page in enumerate(pages):
+            if stop_at is not None:
+                break
+            await page_keys.put((position, page))
+        for _ in range(fetch_workers):
+            await page_keys.put(None)
+
+    async def fetch_worker():
+        nonlocal failures
+        while True:
+            item = await page_keys.get()
+            if item is None:
+                return
+            position, page = item
+            if dropped(position):
+                continue
+            content = await fetch(page)
+            if content is None:
+                logger.info(f"Skipping page {page}: fetch failed")
+                failures += 1
+                if failures >= max_failures:
+                    stop(position)
+                continue
+            failures = 0
+            await raw_pages.put((position, page, content))
+
+    async def parse_worker():
+        while True:
+            item = await raw_pages.get()
+            if item is None:
+                return
+            position, page, content = item
+            if dropped(position):
+                continue
+            try:
+                rows = await loop.run_in_executor(parse_pool, parse, content)
+            except Exception as e:
+                logger.info(f"Error parsing page {page}: {e}")
+                continue
+            keep_going = handle(page, rows)
+            if inspect.isawaitable(keep_going):
+                keep_going = await keep_going
+            if not keep_going:
+                stop(position)
+
+    async def fetch_stage():
+        await asyncio.gather(producer(), *(fetch_worker() for _ in range(fetch_workers)))
+        for _ in range(parse_workers):
+            await raw_pages.put(None)
+
+    # One gather over both stages, so a failing parse worker cannot leave the
+    # fetch workers blocked on a full raw_pages queue
+    tasks = [asyncio.create_task(fetch_stage())]
+    tasks += [asyncio.create_task(parse_worker()) for _ in range(parse_workers)]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
@@ -1,16 +1,48 @@
+import numpy as np
 import pandas as pd
 import mysql.connector
+import mysql.connector.pooling
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from threading import Lock
+import os
 import sys
 import csv
+import warnings
+from scrape_state import ScrapeState
+from typed_csv import read_table
+
+USER_UPSERT = """
+    INSERT INTO user (
+        screen_name, city, country_id, organization_id, contribution,
+        friend_count, registration_date, problems_solved, max_streak,
+        rating, max_rating
+    ) VALUES (
+        %(screen_name)s, %(city)s, %(country_id)s, %(organization_id)s,
+        %(contribution)s, %(friend_count)s, %(registration_date)s,
+        %(problems_solved)s, %(max_streak)s, %(rating)s, %(max_rating)s
+    ) ON DUPLICATE KEY UPDATE
+        city = VALUES(city),
+        country_id = VALUES(country_id),
+        organization_id = VALUES(organization_id),
+        contribution = VALUES(contribution),
+        friend_count = VALUES(friend_count),
+        registration_date = VALUES(registration_date),
+        problems_solved = VALUES(problems_solved),
+        max_streak = VALUES(max_streak),
+        rating = VALUES(rating),
+        max_rating = VALUES(max_rating)
+"""
+
+DB_CONFIG = {
+    'host': "DESKTOP-LVC98F3",
+    'user': "root",
+    'password': "1234567",
+    'database': "codeforces"
+}
 
 def connect_to_db():
-    return mysql.connector.connect(
-        host="DESKTOP-LVC98F3",
-        user="root",
-        password="1234567",
-        database="codeforces"
-    )
+    return mysql.connector.connect(**DB_CONFIG)
 
 def get_or_create_country_id(cursor, country_name):
     if not country_name or pd.isna(country_name):
@@ -53,33 +85,15 @@ def safe_int_convert(value):
     except (ValueError, TypeError):
         return None
 
-def import_users(csv_path):
-    # Read CSV file with explicit data types and handling mixed types
-    df = pd.read_csv(
-        csv_path, 
-        escapechar='\\', 
-        quotechar="'", 
-        encoding='utf-8',
-        low_memory=False,
-        dtype={
-            'username': str,
-            'rating': 'Int64',
-            'rank': str,
-            'max_rating': 'Int64',
-            'contribution': 'Int64',
-            'organization': str,
-            'friend_count': 'Int64',
-            'registration_date': str,
-            'city': str,
-            'country': str,
-            'max_streak': 'Int64',
-            'problems_solved': 'Int64',
-            'processed': str
-        }
-    )
+def read_users_csv(csv_path):
+    # Integer columns come back as nullable Int64, empty cells as <NA>
+    return read_table(csv_path, 'User', escapechar='\\', quotechar="'", encoding='utf-8')
+
+def import_users(csv_path, conn=None):
+    df = read_users_csv(csv_path)
     
     # Connect to database
-    conn = connect_to_db()
+    conn = conn or connect_to_db()
     cursor = conn.cursor()
     
     total_rows = len(df)
@@ -129,29 +143,8 @@ def import_users(csv_path):
                 continue
             
             # Insert or update user
-            query = """
-                INSERT INTO user (
-                    screen_name, city, country_id, organization_id, contribution,
-                    friend_count, registration_date, problems_solved, max_streak,
-                    rating, max_rating
-                ) VALUES (
-                    %(screen_name)s, %(city)s, %(country_id)s, %(organization_id)s,
-                    %(contribution)s, %(friend_count)s, %(registration_date)s,
-                    %(problems_solved)s, %(max_streak)s, %(rating)s, %(max_rating)s
-                ) ON DUPLICATE KEY UPDATE
-                    city = VALUES(city),
-                    country_id = VALUES(country_id),
-                    organization_id = VALUES(organization_id),
-                    contribution = VALUES(contribution),
-                    friend_count = VALUES(friend_count),
-                    registration_date = VALUES(registration_date),
-                    problems_solved = VALUES(problems_solved),
-                    max_streak = VALUES(max_streak),
-                    rating = VALUES(rating),
-                    max_rating = VALUES(max_rating)
-            """
             
-            cursor.execute(query, user_data)
+            cursor.execute(USER_UPSERT, user_data)
             successful_imports += 1
             
             # Print progress every 100 rows
@@ -175,9 +168,276 @@ def import_users(csv_path):
     print(f"Failed imports: {failed_imports}")
     print(f"Success rate: {(successful_imports/total_rows)*100:.1f}%")
 
+def clean_text(series):
+    """Vectorized clean_value for a column of strings: strips quotes, '' and 'null' become None."""
+    text = series.astype('string').str.strip("'\"")
+    text = text.mask(text.isna() | (text == '') | (text.str.lower() == 'null'))
+    return text.astype(object).where(text.notna(), None)
+
+def load_name_ids(cursor, table, id_column, names):
+    """
+    Map every name in `names` to its id in `table` (country or organization).
+
+    Names that are not in the table yet are inserted in one executemany batch,
+    so the whole lookup costs three round trips however many names there are.
+    Keys are lowercased, like the case-insensitive MySQL collation compares
+    them, so 'Cairo University' and 'cairo university' share one row.
+    """
+    wanted = {}
+    for name in names:
+        wanted.setdefault(name.lower(), name)
+    cursor.execute(f"SELECT name, {id_column} FROM {table}")
+    ids = {name.lower(): row_id for name, row_id in cursor.fetchall() if name and name.lower() in wanted}
+
+    missing = sorted(wanted.keys() - ids.keys())
+    if missing:
+        cursor.executemany(f"INSERT INTO {table} (name) VALUES (%s)", [(wanted[key],) for key in missing])
+        cursor.execute(f"SELECT name, {id_column} FROM {table}")
+        ids = {name.lower(): row_id for name, row_id in cursor.fetchall() if name and name.lower() in wanted}
+    return ids
+
+def user_column(df, name):
+    return df[name] if name in df.columns else pd.Series(None, index=df.index, dtype=object)
+
+def resolve_ids(names, ids, existing_ids):
+    """Ids for a name column via load_name_ids' lowercase keys, falling back to an *_id column of the CSV."""
+    return names.str.lower().map(ids).astype('Int64').fillna(existing_ids.astype('Int64'))
+
+def user_frame(df, country_ids, organization_ids):
+    """Turn a users DataFrame into the user table's columns (USER_UPSERT's parameters), column by column."""
+    def column(name):
+        return user_column(df, name)
+
+    country = clean_text(column('country')).astype('string')
+    organization = clean_text(column('organization')).astype('string')
+    users = pd.DataFrame({
+        'screen_name': clean_text(column('username')),
+        'city': clean_text(column('city')),
+        'country_id': resolve_ids(country, country_ids, column('country_id')),
+        'organization_id': resolve_ids(organization, organization_ids, column('organization_id')),
+        'contribution': column('contribution').astype('Int64'),
+        'friend_count': column('friend_count').astype('Int64'),
+        'problems_solved': column('problems_solved').astype('Int64'),
+        'max_streak': column('max_streak').astype('Int64'),
+        'rating': column('rating').astype('Int64'),
+        'max_rating': column('max_rating').astype('Int64')
+    })
+    users = users.astype(object).where(users.notna(), None)
+
+    # Same rule as import_users: anything that is not %Y-%m-%d becomes NULL
+    dates = pd.to_datetime(clean_text(column('registration_date')), format='%Y-%m-%d', errors='coerce')
+    users['registration_date'] = pd.Series(
+        np.where(dates.notna(), dates.dt.to_pydatetime(), None), index=df.index, dtype=object
+    )
+
+    return users[users['screen_name'].notna()]
+
+def prepare_user_records(df, country_ids, organization_ids):
+    """Turn a users DataFrame into USER_UPSERT parameter dicts, column by column instead of row by row."""
+    return user_frame(df, country_ids, organization_ids).to_dict('records')
+
+def load_user_name_ids(cursor, df):
+    """Resolve (country_ids, organization_ids) for every name in a users DataFrame with load_name_ids."""
+    country_ids = load_name_ids(cursor, 'country', 'country_id',
+                                clean_text(user_column(df, 'country')).dropna().unique())
+    organization_ids = load_name_ids(cursor, 'organization', 'organization_id',
+                                     clean_text(user_column(df, 'organization')).dropna().unique())
+    return country_ids, organization_ids
+
+def bulk_import_users(csv_path, conn=None, chunk_size=5000):
+    """
+    Load User.csv with a handful of round trips per chunk instead of per row.
+
+    Country and organization names are resolved up front with
+    load_name_ids (files that only have country_id / organization_id, like
+    the repo's User.csv, keep those ids), and users are sent through
+    executemany in chunks of `chunk_size` (mysql.connector turns each chunk
+    into one multi-row INSERT).
+    """
+    df = read_users_csv(csv_path)
+
+    conn = conn or connect_to_db()
+    cursor = conn.cursor()
+
+    country_ids, organization_ids = load_user_name_ids(cursor, df)
+    records = prepare_user_records(df, country_ids, organization_ids)
+
+    total_rows = len(df)
+    for start in range(0, len(records), chunk_size):
+        cursor.executemany(USER_UPSERT, records[start:start + chunk_size])
+        done = min(start + chunk_size, len(records))
+        print(f"Progress: {done / len(records) * 100:.1f}% ({done}/{len(records)} rows)")
+
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+    print("\nImport Summary:")
+    print(f"Total rows processed: {total_rows}")
+    print(f"Successful imports: {len(records)}")
+    print(f"Skipped (no username): {total_rows - len(records)}")
+    return len(records)
+
+def prepare_user_ids(cursor, df):
+    """Resolve country/organization names once like bulk_import_users, then map each chunk with user_frame."""
+    country_ids, organization_ids = load_user_name_ids(cursor, df)
+
+    def transform(chunk):
+        return user_frame(chunk, country_ids, organization_ids)
+    return transform
+
+def prepare_writer_ids(cursor, df):
+    """contestWriters.csv has handles; resolve them to user ids once and map each chunk."""
+    cursor.execute("SELECT screen_name, user_id FROM user")
+    user_ids = dict(cursor.fetchall())
+
+    def transform(chunk):
+        user_id = chunk['username'].map(user_ids).astype('Int64')
+        unknown = int(user_id.isna().sum())
+        if unknown:
+            print(f"contestwriter: skipped {unknown} rows with unknown handles")
+        return pd.DataFrame({'contest_id': chunk['contest_id'], 'user_id': user_id})[user_id.notna()]
+    return transform
+
+# CSV -> table mapping for import_all. `schema` is the typed_csv schema of the
+# file, `rename` maps CSV columns to table columns, `drop` lists CSV columns
+# the table does not have (ignored when absent) and `prepare(cursor, df)`
+# returns a per-chunk transform for files that need lookups.
+TABLE_IMPORTS = {
+    'country': {'csv': 'country.csv', 'table': 'country', 'schema': 'country'},
+    'organization': {'csv': 'organization.csv', 'table': 'organization', 'schema': 'organization'},
+    'tag': {'csv': 'tag.csv', 'table': 'tag', 'schema': 'tag'},
+    # Same columns as USER_UPSERT: user_id is assigned by the database, users
+    # are matched on screen_name and country/organization names are resolved
+    'user': {'csv': 'User.csv', 'table': 'user', 'schema': 'User', 'prepare': prepare_user_ids},
+    'contest': {'csv': 'contests.csv', 'table': 'contest', 'schema': 'contests',
+                'rename': {'contest_name': 'name', 'start_time': 'date'}, 'drop': ['writers', 'length']},
+    'problem': {'csv': 'problem.csv', 'table': 'problem', 'schema': 'problem',
+                'rename': {'title': 'name'}, 'drop': ['tags', 'difficulty']},
+    'contestwriter': {'csv': 'contestWriters.csv', 'table': 'contestwriter', 'schema': 'contestWriters',
+                      'prepare': prepare_writer_ids},
+    'problemtag': {'csv': 'problemTag.csv', 'table': 'problemtag', 'schema': 'problemTag'},
+}
+
+# Tables in one stage do not reference each other and are loaded concurrently;
+# a stage only starts once every table of the previous one has loaded.
+IMPORT_STAGES = [
+    ['country', 'organization', 'tag'],
+    ['user', 'contest', 'problem'],
+    ['contestwriter', 'problemtag'],
+]
+
+def upsert_query(table, columns):
+    names = ', '.join(f"`{column}`" for column in columns)
+    placeholders = ', '.join(['%s'] * len(columns))
+    updates = ', '.join(f"`{column}` = VALUES(`{column}`)" for column in columns)
+    return f"INSERT INTO `{table}` ({names}) VALUES ({placeholders}) ON DUPLICATE KEY UPDATE {updates}"
+
+def read_import_csv(name, path, spec):
+    """Read one TABLE_IMPORTS file with its table's column names; malformed rows are reported and skipped."""
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        df = read_table(path, spec['schema'], on_bad_lines='warn')
+    for warning in caught:
+        for line in str(warning.message).strip().splitlines():
+            print(f"{name}: skipped malformed row: {line}")
+    df = df.rename(columns=spec.get('rename', {}))
+    return df.drop(columns=spec.get('drop', []), errors='ignore')
+
+def import_table(name, data_dir, connect, state, state_lock, chunk_size):
+    """
+    Load one TABLE_IMPORTS entry chunk by chunk, committing each chunk.
+
+    The number of committed rows is recorded in `state` after every commit,
+    so a rerun skips straight to the first chunk that did not make it (the
+    offset restarts at 0 when the CSV has changed since). Rows the CSV
+    parser cannot split are skipped with a message. Returns False when a
+    chunk fails.
+    """
+    spec = TABLE_IMPORTS[name]
+    path = os.path.join(data_dir, spec['csv'])
+    if not os.path.exists(path):
+        print(f"{name}: {path} not found, skipping")
+        return True
+
+    try:
+        df = read_import_csv(name, path, spec)
+    except Exception as e:
+        print(f"{name}: could not read {path}: {e}")
+        return False
+    mtime = os.path.getmtime(path)
+    with state_lock:
+        progress = state.get('import').setdefault(name, {})
+        if progress.get('mtime') != mtime:
+            progress.update(offset=0, mtime=mtime)
+    if progress['offset'] >= len(df):
+        print(f"{name}: already imported ({len(df)} rows)")
+        return True
+
+    conn = connect()
+    cursor = conn.cursor()
+    try:
+        transform = spec['prepare'](cursor, df) if 'prepare' in spec else None
+        for start in range(progress['offset'], len(df), chunk_size):
+            chunk = df.iloc[start:start + chunk_size]
+            if transform:
+                chunk = transform(chunk)
+            records = list(chunk.astype(object).where(chunk.notna(), None).itertuples(index=False, name=None))
+            try:
+                if records:
+                    cursor.executemany(upsert_query(spec['table'], list(chunk.columns)), records)
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                print(f"{name}: chunk at row {start} failed, stopping this table: {e}")
+                return False
+
+            done = min(start + chunk_size, len(df))
+            with state_lock:
+                progress['offset'] = done
+                state.save()
+            print(f"{name}: {done}/{len(df)} rows ({done / len(df) * 100:.1f}%)")
+        return True
+    finally:
+        cursor.close()
+        conn.close()
+
+def import_all(data_dir='.', pool_size=4, chunk_size=10000, progress_file='import_progress.json', connect=None):
+    """
+    Import every CSV in TABLE_IMPORTS, stage by stage, over a small connection pool.
+
+    Progress lives in `progress_file`; rerunning after a failure resumes
+    each table at its last committed chunk. Returns True when every table
+    loaded.
+    """
+    if connect is None:
+        pool = mysql.connector.pooling.MySQLConnectionPool(pool_name='import', pool_size=pool_size, **DB_CONFIG)
+        connect = pool.get_connection
+
+    state = ScrapeState(progress_file)
+    state_lock = Lock()
+    with ThreadPoolExecutor(max_workers=pool_size) as executor:
+        for stage in IMPORT_STAGES:
+            results = list(executor.map(
+                lambda name: import_table(name, data_dir, connect, state, state_lock, chunk_size), stage
+            ))
+            if not all(results):
+                print(f"Stopping before the next stage; rerun to resume from {progress_file}")
+                return False
+    print("All tables imported")
+    return True
+
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python script.py <path_to_csv>")
+    if len(sys.argv) >= 2 and sys.argv[1] == '--all':
+        # Every CSV in the directory (default: the current one), resumable
+        sys.exit(0 if import_all(sys.argv[2] if len(sys.argv) > 2 else '.') else 1)
+
+    if len(sys.argv) not in (2, 3) or (len(sys.argv) == 3 and sys.argv[2] != '--row-by-row'):
+        print("Usage: python script.py <path_to_csv> [--row-by-row]")
+        print("       python script.py --all [data_dir]")
         sys.exit(1)
     
-    import_users(sys.argv[1])
\ No newline at end of file
+    if len(sys.argv) == 3:
+        import_users(sys.argv[1])
+    else:
+        bulk_import_users(sys.argv[1])
\ No newline at end of file
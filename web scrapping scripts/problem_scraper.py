@@ -1,25 +1,32 @@
-import requests
-from bs4 import BeautifulSoup
+import asyncio
 import csv
+import json
 import re
-import time
-import random
 import os
 import sys
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from threading import Lock
 import logging
 import pandas as pd
+from fetch_engine import FetchEngine
+from output_stage import DedupCsvWriter
+from page_pipeline import run_page_pipeline
+from response_cache import ResponseCache
+from table_parsers import DEFAULT_BACKEND, parse_problem_rows
+from typed_csv import read_table
 
 class CodeforcesProblemScraper:
-    def __init__(self, start_page=1, max_workers=None):
-        self.session = requests.Session()
-        self.headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-        }
-        self.base_url = 'https://codeforces.com'
+    def __init__(self, start_page=1, max_workers=None, rate=2.0, base_url='https://codeforces.com', cache=None,
+                 parser_backend=DEFAULT_BACKEND, parse_workers=None):
+        self.engine = None
+        self.cache = cache  # Optional ResponseCache shared across runs
+        self.base_url = base_url
         self.start_page = start_page
         self.max_workers = max_workers or min(32, os.cpu_count() + 4)
+        self.rate = rate
+        self.parser_backend = parser_backend  # See table_parsers.BACKENDS
+        self.parse_workers = parse_workers or os.cpu_count()
         self.print_lock = Lock()
         
         logging.basicConfig(
@@ -36,112 +43,161 @@ class CodeforcesProblemScraper:
         with self.print_lock:
             self.logger.info(message)
 
-    def fetch_page_data(self, page_url, retries=3):
-        for attempt in range(retries):
-            try:
-                time.sleep(random.uniform(1.5, 2.5))
-                response = self.session.get(page_url, headers=self.headers, timeout=15)
-                response.raise_for_status()
-                return BeautifulSoup(response.content, 'html.parser')
-            except requests.RequestException as e:
-                self.safe_print(f"Error fetching {page_url} (attempt {attempt + 1}/{retries}): {e}")
-                if attempt == retries - 1:
-                    return None
-                time.sleep(5)
-        return None
-
-    def extract_problem_data(self, row):
-        try:
-            # Parse Problem ID and Title
-            cells = row.find_all('td')
-            if len(cells) < 2:
-                return None
-                
-            problem_id = cells[0].find('a').get_text(strip=True)
-            title = cells[1].find('div').get_text(strip=True)
-            
-            # Parse Tags
-            tags = []
-            tags_elements = cells[1].find_all('a', class_='notice')
-            for tag in tags_elements:
-                tag_text = tag.get_text(strip=True)
-                if tag_text:
-                    tags.append(tag_text)
-            
-            # Parse Difficulty
-            difficulty_cell = row.find('span', class_='ProblemRating')
-            difficulty = difficulty_cell.get_text(strip=True) if difficulty_cell else ""
-
-            return {
-                'problem_id': problem_id,
-                'title': title,
-                'tags': ', '.join(tags),
-                'difficulty': difficulty
-            }
-        except Exception as e:
-            self.safe_print(f"Error extracting problem data: {e}")
-            return None
-
-    def process_page(self, page, csv_writer):
+    async def fetch_page_data(self, page_url):
+        content = await self.engine.fetch(page_url)
+        if content is None:
+            self.safe_print(f"Giving up on {page_url}")
+        return content
+
+    async def fetch_page(self, page):
         self.safe_print(f"Processing problem set page {page}...")
-        soup = self.fetch_page_data(f"{self.base_url}/problemset/page/{page}")
-        if not soup:
-            return False
+        return await self.fetch_page_data(f"{self.base_url}/problemset/page/{page}")
+
+    async def _process_pages(self, output, known_ids=None):
+        """
+        Crawl the HTML problemset pages into `output`.
+
+        With `known_ids` (a refresh) the crawl stops at the first page whose
+        problems are all known already; the listing is newest-first, so every
+        later page is known too.
+        """
+        async def handle_page(page, rows):
+            await output.put_async(rows)
+            self.safe_print(f"Page {page} processed successfully.")
+            if known_ids and rows and all(row['problem_id'] in known_ids for row in rows):
+                self.safe_print(f"Page {page} has no new problems, stopping")
+                return False
+            return True
+
+        async with FetchEngine(rate=self.rate, max_connections=self.max_workers, cache=self.cache) as engine:
+            self.engine = engine
+            with ProcessPoolExecutor(max_workers=self.parse_workers) as parse_pool:
+                await run_page_pipeline(
+                    range(self.start_page, 99),  # Adjust max pages as needed
+                    self.fetch_page, partial(parse_problem_rows, backend=self.parser_backend), handle_page,
+                    fetch_workers=self.max_workers, parse_pool=parse_pool, parse_workers=self.parse_workers
+                )
+            self.engine = None
 
-        table = soup.find('table', class_='problems')
-        if not table:
+    async def _fetch_problems_api(self, output, tag_file, problem_tag_file):
+        """
+        Load the whole problemset from one problemset.problems API call.
+
+        Problem rows are streamed into `output`; tag ids come from `tag_file`
+        when it exists (new tags get the next free id), and every
+        (problem_id, tag_id) pair is written to `problem_tag_file`.
+        Returns False when the API is unavailable.
+        """
+        async with FetchEngine(rate=self.rate, max_connections=1, cache=self.cache) as engine:
+            content = await engine.fetch(f"{self.base_url}/api/problemset.problems")
+        if content is None:
+            return False
+        try:
+            data = json.loads(content)
+        except ValueError as e:
+            # e.g. an HTML challenge page served with a 200
+            self.safe_print(f"problemset.problems returned invalid JSON: {e}")
+            return False
+        if data.get('status') != 'OK':
+            self.safe_print(f"problemset.problems failed: {data.get('comment')}")
             return False
 
-        rows = table.find_all('tr')[1:]
-        for row in rows:
-            problem_data = self.extract_problem_data(row)
-            if problem_data:
-                csv_writer.writerow(problem_data)
-        
+        tag_ids = {}
+        if os.path.exists(tag_file):
+            with open(tag_file, newline='', encoding='utf-8') as f:
+                tag_ids = {row['name']: int(row['tag_id']) for row in csv.DictReader(f)}
+        next_tag_id = max(tag_ids.values(), default=0) + 1
+
+        problems = data['result']['problems']
+        with open(problem_tag_file, 'w', newline='', encoding='utf-8') as f:
+            problem_tags = csv.writer(f)
+            problem_tags.writerow(['problem_id', 'tag_id'])
+
+            for start in range(0, len(problems), 1000):
+                rows = []
+                for problem in problems[start:start + 1000]:
+                    problem_id = f"{problem.get('contestId', '')}{problem['index']}"
+                    tags = problem.get('tags', [])
+                    rows.append({
+                        'problem_id': problem_id,
+                        'title': problem['name'],
+                        'tags': ', '.join(tags),
+                        'difficulty': problem.get('rating', '')
+                    })
+                    for tag in tags:
+                        if tag not in tag_ids:
+                            tag_ids[tag] = next_tag_id
+                            next_tag_id += 1
+                        problem_tags.writerow([problem_id, tag_ids[tag]])
+                await output.put_async(rows)
+
+        with open(tag_file, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['tag_id', 'name'])
+            writer.writerows(sorted((tag_id, name) for name, tag_id in tag_ids.items()))
+
+        self.safe_print(f"Loaded {len(problems)} problems and {len(tag_ids)} tags from the API")
         return True
 
-    def fetch_problems_parallel(self, output_file='problems_raw.csv'):
-        with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
-            fieldnames = ['problem_id', 'title', 'tags', 'difficulty']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-
-            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                futures = {
-                    executor.submit(self.process_page, page, writer): page
-                    for page in range(self.start_page, 99)  # Adjust max pages as needed
-                }
-                
-                for future in as_completed(futures):
-                    page = futures[future]
-                    try:
-                        future.result()
-                        self.safe_print(f"Page {page} processed successfully.")
-                    except Exception as e:
-                        self.safe_print(f"Error processing page {page}: {e}")
-
-def clean_duplicates(input_file='problems_raw.csv', output_file='problems_cleaned.csv'):
-    df = pd.read_csv(input_file)
-    df = df.replace('', pd.NA)
-    df['problem_id'] = df['problem_id'].astype(str)
+    def fetch_problems_parallel(self, output_file='problems_cleaned.csv', use_api=True,
+                                tag_file='tag.csv', problem_tag_file='problemTag.csv', refresh=False):
+        """
+        Fetch the problemset into `output_file`, writing each problem_id once.
+
+        The problemset.problems API is tried first (one request, and it also
+        produces `tag_file` and `problem_tag_file`); the HTML problemset pages
+        are crawled only if the API fails or `use_api` is False.
+
+        With `refresh=True` an existing `output_file` is updated in place. The
+        API returns every problem, so its rows are merged over the old ones
+        (ratings and tags added since the last run are picked up). The HTML
+        crawl only appends new problem_ids and stops at the first page with
+        nothing new.
+        """
+        fieldnames = ['problem_id', 'title', 'tags', 'difficulty']
+        if use_api:
+            api_file = f"{output_file}.api"
+            with DedupCsvWriter(api_file, fieldnames, key='problem_id') as output:
+                loaded = asyncio.run(self._fetch_problems_api(output, tag_file, problem_tag_file))
+            if loaded:
+                merge_problems(api_file, output_file, merge_existing=refresh)
+                return
+            os.remove(api_file)
+            self.safe_print("Falling back to scraping the HTML problemset pages")
+
+        with DedupCsvWriter(output_file, fieldnames, key='problem_id', append=refresh) as output:
+            known_ids = frozenset(output.seen) if refresh else None
+            asyncio.run(self._process_pages(output, known_ids))
+
+def merge_problems(input_file, output_file='problems_cleaned.csv', merge_existing=False):
+    """
+    Move `input_file` to `output_file`.
+
+    With merge_existing=True the rows already in output_file are kept and the
+    rows from input_file are merged in (new data wins on duplicates).
+    """
+    df = read_table(input_file, 'problem')
+    if merge_existing and os.path.exists(output_file):
+        df = pd.concat([df, read_table(output_file, 'problem')], ignore_index=True)
     df = df.drop_duplicates(subset=['problem_id'], keep='first')
-    df_final = df.fillna('')
-    df_final.to_csv(output_file, index=False)
-    
-    print(f"Original number of records: {len(df)}")
-    print(f"Number of records after cleaning: {len(df_final)}")
-    print(f"Removed {len(df) - len(df_final)} duplicate records")
-    
-    return df_final
+
+    tmp_file = f"{output_file}.tmp"
+    df.to_csv(tmp_file, index=False)
+    os.replace(tmp_file, output_file)
+    os.remove(input_file)
+    print(f"Wrote {len(df)} problems to {output_file}")
+    return df
 
 def main():
     start_page = int(sys.argv[1]) if len(sys.argv) > 1 else 1
     max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    rate = float(sys.argv[3]) if len(sys.argv) > 3 else 2.0
     
-    scraper = CodeforcesProblemScraper(start_page=start_page, max_workers=max_workers)
-    scraper.fetch_problems_parallel()
-
-    clean_duplicates()
+    scraper = CodeforcesProblemScraper(start_page=start_page, max_workers=max_workers, rate=rate,
+                                       cache=ResponseCache.from_env())
+    # Rows are deduplicated as they are written, so no cleaning pass is needed.
+    # An existing output file is refreshed in place (see fetch_problems_parallel).
+    scraper.fetch_problems_parallel('problems_cleaned.csv', refresh=os.path.exists('problems_cleaned.csv'))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,82 @@
+import csv
+import os
+import sys
+import time
+
+from response_cache import ResponseCache
+from user_scraper import CodeforcesProfileScraper
+from users_API_only import CodeforcesUserCrawler
+
+# user.ratedList fields compared against the snapshot taken at the last scrape
+SNAPSHOT_FIELDS = ['rating', 'maxRating', 'contribution', 'lastOnlineTimeSeconds']
+
+
+class RefreshPlanner:
+    """
+    Decide which profiles need re-scraping, using user.ratedList metadata.
+
+    A snapshot file records, per handle, the ratedList fields seen when the
+    profile was last scraped and the time of that scrape. A user is queued
+    when they were never scraped, have been online since their last scrape
+    (lastOnlineTimeSeconds > scraped_at), or when rating, maxRating or
+    contribution changed. Everyone else is idle and keeps their stored
+    max_streak / problems_solved.
+    """
+
+    def __init__(self, snapshot_file='profile_snapshot.csv'):
+        self.snapshot_file = snapshot_file
+        self.snapshot = {}
+        self.current = {}
+        if os.path.exists(snapshot_file):
+            with open(snapshot_file, newline='', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    self.snapshot[row['handle']] = row
+
+    def _needs_refresh(self, user, previous):
+        if previous is None:
+            return True
+        if user.get('lastOnlineTimeSeconds', 0) > float(previous['scraped_at']):
+            return True
+        return any(str(user.get(field, '')) != previous[field] for field in SNAPSHOT_FIELDS[:-1])
+
+    def plan(self, users):
+        """Return the handles from `users` (ratedList entries) that should be scraped."""
+        queued = []
+        total = 0
+        for user in users:
+            total += 1
+            handle = user['handle']
+            self.current[handle] = {field: str(user.get(field, '')) for field in SNAPSHOT_FIELDS}
+            if self._needs_refresh(user, self.snapshot.get(handle)):
+                queued.append(handle)
+
+        print(f"Refresh plan: {len(queued)} of {total} users changed since their last scrape")
+        return queued
+
+    def commit(self, scraped_handles, scraped_at=None):
+        """Record the current ratedList fields for the handles that were scraped."""
+        scraped_at = scraped_at or time.time()
+        for handle in scraped_handles:
+            if handle in self.current:
+                self.snapshot[handle] = {'handle': handle, **self.current[handle], 'scraped_at': scraped_at}
+
+        tmp_file = f"{self.snapshot_file}.tmp"
+        with open(tmp_file, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=['handle'] + SNAPSHOT_FIELDS + ['scraped_at'])
+            writer.writeheader()
+            writer.writerows(self.snapshot.values())
+        os.replace(tmp_file, self.snapshot_file)
+
+
+if __name__ == "__main__":
+    input_file = sys.argv[1] if len(sys.argv) > 1 else 'codeforces_users.csv'
+    cache = ResponseCache.from_env()
+
+    planner = RefreshPlanner()
+    started_at = time.time()
+    handles = planner.plan(CodeforcesUserCrawler(cache=cache).iter_users())
+
+    scraper = CodeforcesProfileScraper(input_file=input_file, cache=cache)
+    # Queued users changed since their last scrape, so a cached page of theirs is stale
+    results = scraper.update_users_data(usernames=handles, force_refresh=True) or {}
+    planner.commit(results.keys(), scraped_at=started_at)
@@ -0,0 +1,269 @@
+import io
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import time
+from collections import namedtuple
+from threading import Lock
+from urllib.parse import urlencode
+
+# Seconds a cached response is served without revalidation, by URL pattern.
+# The first matching pattern wins; anything else falls back to default_ttl.
+# A TTL of None means responses are never stored: contest.status pages are
+# large and the submission harvest never reads one back.
+DEFAULT_TTLS = [
+    (r'/api/contest\.status', None),
+    (r'/api/(user\.ratedList|problemset\.problems|contest\.list)', 60 * 60),
+    (r'/profile/', 24 * 60 * 60),
+    (r'/contests?/\d+', 24 * 60 * 60),
+    (r'/(contests|problemset)/page/', 60 * 60),
+]
+
+CachedResponse = namedtuple('CachedResponse', ['body', 'etag', 'last_modified', 'fetched_at'])
+
+
+class CacheMissError(Exception):
+    """Raised in cache-only mode when a URL has never been fetched."""
+
+
+def cache_key(url, params=None):
+    """Build the cache key for a request: the URL plus its sorted query parameters."""
+    if not params:
+        return url
+    return f"{url}?{urlencode(sorted((k, str(v)) for k, v in params.items()))}"
+
+
+class ResponseCache:
+    """
+    On-disk HTTP response cache shared by all scrapers.
+
+    Responses are stored in a SQLite file keyed by URL. Fresh entries (younger
+    than the TTL for their URL) are served without touching the network; stale
+    entries are revalidated with If-None-Match / If-Modified-Since. When the
+    file grows past `max_bytes` the least recently used entries are evicted.
+    With `offline=True` the cache never goes to the network and serves whatever
+    it has, regardless of age.
+    """
+
+    def __init__(self, path='http_cache.sqlite3', max_bytes=1024 * 1024 * 1024, ttls=None, default_ttl=60 * 60, offline=False):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttls = [(re.compile(pattern), ttl) for pattern, ttl in (ttls or DEFAULT_TTLS)]
+        self.default_ttl = default_ttl
+        self.offline = offline
+        self.lock = Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                body BLOB NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL
+            )
+        """)
+        self.conn.execute('CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)')
+        columns = {row[1] for row in self.conn.execute('PRAGMA table_info(responses)')}
+        if 'streamed_body' not in columns:
+            # Bodies written by store_file. SQLite only fills a zeroblob in place
+            # when it is the row's last column, so these live apart from `body`
+            self.conn.execute('ALTER TABLE responses ADD COLUMN streamed_body BLOB')
+        self.conn.commit()
+        self.total_bytes = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    @classmethod
+    def from_env(cls):
+        """Build the cache the scripts use by default (CF_CACHE_PATH, CF_CACHE_ONLY=1)."""
+        return cls(
+            path=os.environ.get('CF_CACHE_PATH', 'http_cache.sqlite3'),
+            offline=os.environ.get('CF_CACHE_ONLY') == '1'
+        )
+
+    def ttl_for(self, url):
+        for pattern, ttl in self.ttls:
+            if pattern.search(url):
+                return ttl
+        return self.default_ttl
+
+    def get(self, url, with_body=True):
+        """Return the CachedResponse for `url` (fresh or not), or None; body is None without `with_body`."""
+        body = 'CASE WHEN streamed_body IS NULL THEN body ELSE streamed_body END' if with_body else 'NULL'
+        with self.lock:
+            row = self.conn.execute(
+                f'SELECT {body}, etag, last_modified, fetched_at FROM responses WHERE url = ?', (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute('UPDATE responses SET accessed_at = ? WHERE url = ?', (time.time(), url))
+            self.conn.commit()
+        return CachedResponse(*row)
+
+    def is_fresh(self, url, entry):
+        ttl = self.ttl_for(url)
+        return self.offline or (ttl is not None and time.time() - entry.fetched_at < ttl)
+
+    def get_fresh(self, url):
+        """Return the cached body if it can be served without a request, else None."""
+        entry = self.get(url)
+        if entry is not None and self.is_fresh(url, entry):
+            return entry.body
+        return None
+
+    def validators(self, entry):
+        """Conditional request headers for revalidating a stale entry."""
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def store(self, url, body, etag=None, last_modified=None):
+        if self.ttl_for(url) is None:
+            return
+        now = time.time()
+        with self.lock:
+            old = self.conn.execute('SELECT size FROM responses WHERE url = ?', (url,)).fetchone()
+            self.conn.execute(
+                'INSERT OR REPLACE INTO responses (url, body, etag, last_modified, fetched_at, accessed_at, size) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (url, body, etag, last_modified, now, now, len(body))
+            )
+            self.total_bytes += len(body) - (old[0] if old else 0)
+            self._evict()
+            self.conn.commit()
+
+    def store_file(self, url, f, etag=None, last_modified=None):
+        """
+        Like store, for a body in the binary file `f`.
+
+        Where sqlite3 has incremental blob I/O (Python 3.11+) the body is
+        copied in chunks, so it never has to fit in memory.
+        """
+        if self.ttl_for(url) is None:
+            return
+        if not hasattr(self.conn, 'blobopen'):
+            f.seek(0)
+            self.store(url, f.read(), etag, last_modified)
+            return
+
+        size = f.seek(0, io.SEEK_END)
+        f.seek(0)
+        now = time.time()
+        with self.lock:
+            old = self.conn.execute('SELECT size FROM responses WHERE url = ?', (url,)).fetchone()
+            rowid = self.conn.execute(
+                'INSERT OR REPLACE INTO responses '
+                '(url, body, etag, last_modified, fetched_at, accessed_at, size, streamed_body) '
+                "VALUES (?, x'', ?, ?, ?, ?, ?, zeroblob(?))",
+                (url, etag, last_modified, now, now, size, size)
+            ).lastrowid
+            with self.conn.blobopen('responses', 'streamed_body', rowid) as blob:
+                shutil.copyfileobj(f, blob, 1024 * 1024)
+            self.total_bytes += size - (old[0] if old else 0)
+            self._evict()
+            self.conn.commit()
+
+    def open_body(self, url):
+        """A readable binary file over the cached body of `url` (streamed if store_file wrote it), or None."""
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT rowid, streamed_body IS NOT NULL FROM responses WHERE url = ?', (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1]:
+                return self.conn.blobopen('responses', 'streamed_body', row[0], readonly=True)
+            body = self.conn.execute('SELECT body FROM responses WHERE rowid = ?', (row[0],)).fetchone()[0]
+        return io.BytesIO(body)
+
+    def touch(self, url):
+        """Mark an entry as fresh again after a 304 Not Modified."""
+        now = time.time()
+        with self.lock:
+            self.conn.execute('UPDATE responses SET fetched_at = ?, accessed_at = ? WHERE url = ?', (now, now, url))
+            self.conn.commit()
+
+    def _evict(self):
+        # Drop least recently used entries until the cache fits again.
+        while self.total_bytes > self.max_bytes:
+            rows = self.conn.execute(
+                'SELECT url, size FROM responses ORDER BY accessed_at LIMIT 100'
+            ).fetchall()
+            if not rows:
+                break
+            for url, size in rows:
+                self.conn.execute('DELETE FROM responses WHERE url = ?', (url,))
+                self.total_bytes -= size
+                if self.total_bytes <= self.max_bytes:
+                    break
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def fetch_with_cache(session, url, cache, params=None, revalidate=False, **kwargs):
+    """
+    GET `url` with a requests-style session, going through `cache`.
+
+    Returns the response body as bytes. With `revalidate` a fresh entry is
+    not served as is but revalidated like a stale one. HTTP errors are
+    raised exactly as `response.raise_for_status()` would; in cache-only
+    mode a URL that was never fetched raises CacheMissError.
+    """
+    key = cache_key(url, params)
+    entry = cache.get(key)
+    if entry is not None and (cache.offline or (not revalidate and cache.is_fresh(key, entry))):
+        return entry.body
+    if cache.offline:
+        raise CacheMissError(key)
+
+    headers = dict(kwargs.pop('headers', None) or {})
+    headers.update(cache.validators(entry))
+    response = session.get(url, params=params, headers=headers, **kwargs)
+    if response.status_code == 304 and entry is not None:
+        cache.touch(key)
+        return entry.body
+    response.raise_for_status()
+    body = response.content
+    cache.store(key, body, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+    return body
+
+
+def open_with_cache(session, url, cache, params=None, **kwargs):
+    """
+    Streaming variant of fetch_with_cache for very large responses.
+
+    Returns a readable binary file with the body instead of bytes. A fresh
+    or revalidated entry is read straight from the cache; otherwise the
+    response is streamed into a temporary file, which is copied into the
+    cache and returned rewound. Errors are raised as in fetch_with_cache.
+    Close the returned file when done.
+    """
+    key = cache_key(url, params)
+    entry = cache.get(key, with_body=False)
+    if entry is not None and cache.is_fresh(key, entry):
+        return cache.open_body(key)
+    if cache.offline:
+        raise CacheMissError(key)
+
+    headers = dict(kwargs.pop('headers', None) or {})
+    headers.update(cache.validators(entry))
+    with session.get(url, params=params, headers=headers, stream=True, **kwargs) as response:
+        if response.status_code == 304 and entry is not None:
+            cache.touch(key)
+            return cache.open_body(key)
+        response.raise_for_status()
+        response.raw.decode_content = True  # Let urllib3 undo gzip
+        body = tempfile.TemporaryFile()
+        shutil.copyfileobj(response.raw, body, 1024 * 1024)
+    cache.store_file(key, body, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+    body.seek(0)
+    return body
@@ -0,0 +1,28 @@
+import json
+import os
+
+
+class ScrapeState:
+    """
+    Watermarks persisted between scraper runs, stored as one JSON file.
+
+    Each scraper keeps its own section, e.g. state.get('contests') ->
+    {'max_contest_id': 2050}. Writes go through a temporary file so a crash
+    mid-save never leaves a truncated state behind.
+    """
+
+    def __init__(self, path='scrape_state.json'):
+        self.path = path
+        self.data = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.data = json.load(f)
+
+    def get(self, section):
+        return self.data.setdefault(section, {})
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,105 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from submission_store import read_submissions
+from typed_csv import read_table
+
+# Verdict spellings used by the status pages and by the API respectively
+ACCEPTED_VERDICTS = ['Accepted', 'OK']
+
+
+def compute_user_metrics(submissions):
+    """
+    Compute problems_solved and max_streak per user from submission records.
+
+    `submissions` has the SubmissionScraper columns (at least username,
+    problem_id, verdict, submission_time). problems_solved is the number of
+    distinct problems with an accepted submission; max_streak is the longest
+    run of consecutive UTC days with at least one submission of any verdict.
+    Everything is computed with vectorized group-bys, no per-user Python loop.
+    """
+    df = submissions[['username', 'problem_id', 'verdict', 'submission_time']]
+
+    solved = (
+        df[df['verdict'].isin(ACCEPTED_VERDICTS)]
+        .groupby('username')['problem_id']
+        .nunique()
+        .rename('problems_solved')
+    )
+
+    # One row per (user, active day), sorted so that runs of consecutive days
+    # are adjacent; a new run starts wherever the gap is not exactly one day
+    # or the user changes.
+    days = pd.DataFrame({
+        'username': df['username'],
+        'day': pd.to_datetime(df['submission_time'], utc=True).dt.floor('D')
+    }).dropna().drop_duplicates().sort_values(['username', 'day'])
+
+    # Days since the epoch; converting through the tz-naive values keeps this
+    # vectorized for tz-aware columns (e.g. from the Parquet store)
+    day_numbers = days['day'].dt.tz_convert(None).to_numpy().astype('datetime64[D]').astype(np.int64)
+    users = days['username'].to_numpy()
+    new_run = np.ones(len(days), dtype=bool)
+    new_run[1:] = (np.diff(day_numbers) != 1) | (users[1:] != users[:-1])
+    run_ids = np.cumsum(new_run)
+
+    streak = (
+        days.assign(run=run_ids)
+        .groupby(['username', 'run'])
+        .size()
+        .groupby('username')
+        .max()
+        .rename('max_streak')
+    )
+
+    metrics = pd.concat([solved, streak], axis=1)
+    metrics['problems_solved'] = metrics['problems_solved'].fillna(0).astype('Int64')
+    metrics['max_streak'] = metrics['max_streak'].astype('Int64')
+    return metrics.rename_axis('username').reset_index()
+
+
+def apply_to_users(metrics, users_file='codeforces_users.csv', output_file='codeforces_users_metrics.csv'):
+    """
+    Write the users CSV with the computed metrics to `output_file`.
+
+    When the CSV already has scraped values (from CodeforcesProfileScraper),
+    they are kept in scraped_max_streak / scraped_problems_solved so the two
+    sources can be cross-checked. Rerunning on a file this function wrote
+    keeps its scraped_* columns and replaces the computed ones, so passing
+    output_file=users_file is safe too.
+    """
+    users = read_table(users_file, 'User')
+    for column in ('max_streak', 'problems_solved'):
+        if column in users.columns:
+            if f"scraped_{column}" in users.columns:
+                users = users.drop(columns=column)
+            else:
+                users = users.rename(columns={column: f"scraped_{column}"})
+
+    users = users.merge(metrics, on='username', how='left')
+    users.to_csv(output_file, index=False)
+
+    for column in ('max_streak', 'problems_solved'):
+        if f"scraped_{column}" in users.columns:
+            both = users[column].notna() & users[f"scraped_{column}"].notna()
+            mismatches = (users.loc[both, column] != users.loc[both, f"scraped_{column}"]).sum()
+            print(f"{column}: {both.sum()} users with both values, {mismatches} mismatches")
+    return users
+
+
+if __name__ == "__main__":
+    submissions_file = sys.argv[1] if len(sys.argv) > 1 else 'submissions_store'
+    users_file = sys.argv[2] if len(sys.argv) > 2 else 'codeforces_users.csv'
+    output_file = sys.argv[3] if len(sys.argv) > 3 else 'codeforces_users_metrics.csv'
+
+    if os.path.isdir(submissions_file):
+        # Partitioned Parquet store: decode only the columns the metrics need
+        submissions = read_submissions(submissions_file, columns=['username', 'problem_id', 'verdict', 'submission_time'])
+    else:
+        submissions = pd.read_csv(submissions_file)
+    metrics = compute_user_metrics(submissions)
+    print(f"Computed metrics for {len(metrics)} users")
+    apply_to_users(metrics, users_file, output_file)
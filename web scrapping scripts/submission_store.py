@@ -0,0 +1,127 @@
+"""
+Columnar submission store: Parquet files partitioned by contest_id.
+
+    store/
+        contest_id=1234/part-<uuid>-0.parquet
+        contest_id=1235/...
+
+Columns use compact Arrow types instead of the strings the scrapers produce:
+int64 ids, int32 time (ms) and memory (KB), dictionary-encoded verdict and
+language (pandas categoricals once read), and a UTC timestamp for
+submission_time. Readers go through pyarrow.dataset, so a contest filter only
+opens the matching partition directories and only the requested columns are
+decoded.
+"""
+import logging
+import os
+import uuid
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from output_stage import QueuedWriter
+
+logger = logging.getLogger(__name__)
+
+SUBMISSION_SCHEMA = pa.schema([
+    ('submission_id', pa.int64()),
+    ('contest_id', pa.int64()),
+    ('submission_time', pa.timestamp('s', tz='UTC')),
+    ('problem_id', pa.string()),
+    ('language', pa.dictionary(pa.int32(), pa.string())),
+    ('verdict', pa.dictionary(pa.int32(), pa.string())),
+    ('time', pa.int32()),
+    ('memory', pa.int32()),
+    ('username', pa.string()),
+])
+
+PARTITIONING = ds.partitioning(pa.schema([('contest_id', pa.int64())]), flavor='hive')
+
+
+def rows_to_table(rows):
+    """Build a SUBMISSION_SCHEMA table from submissions CSV row dicts."""
+    columns = {}
+    for field in SUBMISSION_SCHEMA:
+        values = [row[field.name] for row in rows]
+        if field.name == 'submission_time':
+            parsed = pc.strptime(pa.array(values, pa.string()), format='%Y-%m-%d %H:%M:%S', unit='s')
+            columns[field.name] = parsed.cast(field.type)
+        elif pa.types.is_dictionary(field.type):
+            columns[field.name] = pa.array(values, pa.string()).dictionary_encode()
+        else:
+            columns[field.name] = pa.array(values, field.type)
+    return pa.table(columns, schema=SUBMISSION_SCHEMA)
+
+
+class ParquetSink(QueuedWriter):
+    """
+    Submission sink that writes the partitioned Parquet store.
+
+    A drop-in replacement for DedupCsvWriter in SubmissionScraper.run_scraper:
+    producers `put` lists of row dicts, and one background thread buffers them
+    and writes a new file per touched partition every `batch_size` rows. Rows
+    are not deduplicated on write; readers that can see overlapping harvests
+    should drop duplicate submission_ids. `checkpoint(callback)` writes out
+    the buffered rows and then runs `callback` on the writer thread.
+    """
+
+    def __init__(self, root='submissions_store', batch_size=100000, queue_size=64):
+        self.root = root
+        self.batch_size = batch_size
+        self.written = 0
+        super().__init__(f"writer-{os.path.basename(root)}", queue_size)
+
+    def start(self):
+        os.makedirs(self.root, exist_ok=True)
+        super().start()
+
+    def close(self):
+        super().close()
+        logger.info(f"{self.root}: wrote {self.written} submissions")
+
+    def _flush(self, batch):
+        if not batch:
+            return
+        ds.write_dataset(
+            rows_to_table(batch), self.root, format='parquet', partitioning=PARTITIONING,
+            basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+            existing_data_behavior='overwrite_or_ignore'
+        )
+        self.written += len(batch)
+
+    def _run(self):
+        batch = []
+        while True:
+            rows = self.queue.get()
+            if rows is self.CLOSE:
+                break
+            if isinstance(rows, tuple) and rows[0] is self.CHECKPOINT:
+                self._flush(batch)
+                batch = []
+                rows[1]()
+                continue
+            batch.extend(rows)
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+        self._flush(batch)
+
+
+def submission_dataset(root='submissions_store'):
+    return ds.dataset(root, schema=SUBMISSION_SCHEMA, format='parquet', partitioning=PARTITIONING)
+
+
+def read_submissions(root='submissions_store', columns=None, contest_ids=None, filter=None):
+    """
+    Load submissions from the store as a DataFrame.
+
+    `columns` limits which columns are decoded; `contest_ids` restricts the
+    read to those partitions and `filter` is any extra pyarrow.dataset
+    expression (e.g. ds.field('verdict') == 'OK'), pushed down to the
+    Parquet row-group statistics.
+    """
+    if contest_ids is not None:
+        contest_filter = ds.field('contest_id').isin([int(c) for c in contest_ids])
+        filter = contest_filter if filter is None else contest_filter & filter
+    return submission_dataset(root).to_table(columns=columns, filter=filter).to_pandas()
\ No newline at end of file
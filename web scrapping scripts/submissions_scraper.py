@@ -1,145 +1,251 @@
-from bs4 import BeautifulSoup
+import asyncio
+import copy
+import json
 import logging
-from typing import Dict, List, Optional
-from utils import ScraperUtils, retry_on_failure
+import sys
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+from fetch_engine import FetchEngine
+from output_stage import DedupCsvWriter
+from response_cache import ResponseCache
+from scrape_state import ScrapeState
+from submission_store import ParquetSink
+from typed_csv import read_table
+
+SUBMISSION_FIELDS = ['submission_id', 'contest_id', 'submission_time', 'problem_id', 'language', 'verdict', 'time',
+                     'memory', 'username']
+
+
+def api_submission_row(submission: Dict) -> Dict:
+    """Turn a contest.status entry into a submissions CSV row (time in UTC, memory in KB)."""
+    problem = submission['problem']
+    members = submission.get('author', {}).get('members', [])
+    return {
+        'submission_id': submission['id'],
+        'contest_id': submission.get('contestId', problem.get('contestId')),
+        'submission_time': datetime.fromtimestamp(submission['creationTimeSeconds'], timezone.utc)
+                                   .strftime('%Y-%m-%d %H:%M:%S'),
+        'problem_id': f"{problem.get('contestId', '')}{problem['index']}",
+        'language': submission.get('programmingLanguage', ''),
+        'verdict': submission.get('verdict', ''),  # Missing while the submission is still being judged
+        'time': submission.get('timeConsumedMillis'),
+        'memory': submission.get('memoryConsumedBytes', 0) // 1024,
+        # Team submissions are credited to the first member
+        'username': members[0]['handle'] if members else ''
+    }
 
-class SubmissionScraper:
-    def __init__(self, max_pages_per_contest: int = 5):
-        self.utils = ScraperUtils()
-        self.submissions_data = []
-        self.max_pages = max_pages_per_contest
-
-    @retry_on_failure(max_retries=3)
-    def scrape_contest_submissions(self, contest_id: str, url: str) -> List[Dict]:
-        """Scrape submissions for a specific contest"""
-        logging.info(f"Scraping submissions for contest {contest_id}")
-        submissions = []
-        page = 1
-
-        while page <= self.max_pages:
-            page_url = f"{url}/page/{page}"
-            response = self.utils.make_request(page_url)
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Find the submissions table
-            submissions_table = soup.find('table', {'class': 'status-frame-datatable'})
-            if not submissions_table:
-                break
-
-            page_submissions = self._parse_submissions_table(submissions_table, contest_id)
-            submissions.extend(page_submissions)
-
-            # Check if there's a next page
-            if not self._has_next_page(soup):
-                break
-
-            page += 1
-
-        logging.info(f"Scraped {len(submissions)} submissions for contest {contest_id}")
-        return submissions
-
-    def _parse_submissions_table(self, table: BeautifulSoup, contest_id: str) -> List[Dict]:
-        """Parse the submissions table and extract submission information"""
-        submissions = []
-        rows = table.find_all('tr')[1:]  # Skip header row
-
-        for row in rows:
-            try:
-                submission = self._extract_submission_info(row, contest_id)
-                if submission:
-                    submissions.append(submission)
-            except Exception as e:
-                logging.error(f"Error parsing submission row: {str(e)}")
-                continue
-
-        return submissions
 
-    def _extract_submission_info(self, row: BeautifulSoup, contest_id: str) -> Optional[Dict]:
-        """Extract submission information from a table row"""
-        try:
-            cols = row.find_all('td')
-            if len(cols) < 8:  # Ensure we have all required columns
-                return None
-
-            return {
-                'submission_id': cols[0].text.strip(),
-                'contest_id': contest_id,
-                'submission_time': self._parse_submission_time(cols[1].text.strip()),
-                'problem_id': self._extract_problem_id(cols[3]),
-                'language': cols[4].text.strip(),
-                'verdict': self._extract_verdict(cols[5]),
-                'time': self._extract_time(cols[6].text.strip()),
-                'memory': self._extract_memory(cols[7].text.strip()),
-                'username': self._extract_username(cols[2])
-            }
-        except Exception as e:
-            logging.error(f"Error extracting submission info: {str(e)}")
+class SubmissionScraper:
+    """
+    Harvest contest submissions from the contest.status API.
+
+    Each contest is paged through with `from`/`count`; up to `max_contests`
+    contests are in flight at once, all sharing the FetchEngine's rate limit.
+    Every page is handed to a sink (a submission_store.ParquetSink, or a
+    DedupCsvWriter for CSV) as soon as it arrives, so memory stays flat no
+    matter how many contests are harvested.
+
+    Progress is kept per contest in the 'submissions' section of ScrapeState:
+
+        {'1234': {'max_id': ..., 'min_id': ..., 'count': ..., 'complete': ...}}
+
+    contest.status lists submissions newest first, so the stored ones are
+    always positions 1..count of that list. A refresh pages from the top only
+    until it reaches max_id; a backfill continues at position count + 1 and
+    marks the contest complete once the list runs out. `max_pages` caps the
+    backfill pages per contest and run, so a huge contest is finished over
+    several runs. Each contest's watermark is saved as soon as the sink has
+    written that contest's rows, so an interrupted run keeps the progress
+    of every contest it finished.
+    """
+
+    def __init__(self, rate: float = 2.0, max_contests: int = 4, page_size: int = 10000, max_pages: Optional[int] = None,
+                 base_url: str = 'https://codeforces.com', cache: Optional[ResponseCache] = None):
+        self.rate = rate  # Requests per second shared by all contests in flight
+        self.max_contests = max_contests
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.base_url = base_url
+        self.cache = cache
+        self.engine = None
+        self.state = None
+        self.watermarks = {}
+
+        logging.basicConfig(
+            level=logging.INFO,
+            format='%(asctime)s - %(levelname)s - %(message)s',
+            handlers=[
+                logging.FileHandler('scraper.log'),
+                logging.StreamHandler()
+            ]
+        )
+        self.logger = logging.getLogger(__name__)
+
+    async def fetch_status_page(self, contest_id: str, start: int) -> Optional[List[Dict]]:
+        """Return the submissions `start`..`start + page_size - 1` (1-based, newest first), or None on failure."""
+        params = {'contestId': contest_id, 'from': start, 'count': self.page_size}
+        content = await self.engine.fetch(f"{self.base_url}/api/contest.status", params=params)
+        if content is None:
             return None
-
-    @staticmethod
-    def _parse_submission_time(time_str: str) -> str:
-        """Parse submission time to standard format"""
-        return time_str  # You might want to standardize the format
-
-    @staticmethod
-    def _extract_problem_id(problem_cell: BeautifulSoup) -> str:
-        """Extract problem ID from problem cell"""
-        problem_link = problem_cell.find('a')
-        return problem_link.text.strip() if problem_link else ""
-
-    @staticmethod
-    def _extract_verdict(verdict_cell: BeautifulSoup) -> str:
-        """Extract verdict from verdict cell"""
-        verdict_span = verdict_cell.find('span', {'class': 'verdict-accepted'})
-        return verdict_span.text.strip() if verdict_span else verdict_cell.text.strip()
-
-    @staticmethod
-    def _extract_time(time_str: str) -> Optional[int]:
-        """Extract execution time in milliseconds"""
         try:
-            return int(''.join(filter(str.isdigit, time_str)))
-        except ValueError:
+            data = json.loads(content)
+        except ValueError as e:
+            self.logger.info(f"contest.status returned invalid JSON for contest {contest_id}: {e}")
             return None
-
-    @staticmethod
-    def _extract_memory(memory_str: str) -> Optional[int]:
-        """Extract memory usage in KB"""
-        try:
-            return int(''.join(filter(str.isdigit, memory_str)))
-        except ValueError:
+        if data.get('status') != 'OK':
+            self.logger.info(f"contest.status failed for contest {contest_id}: {data.get('comment')}")
             return None
+        return data['result']
+
+    async def _harvest(self, contest_id: str, sink, start: int, keep, stop_at_skip: bool,
+                       max_pages: Optional[int]) -> Dict:
+        """
+        Page through one contest from position `start`, writing the submissions whose id passes `keep`.
+
+        With `stop_at_skip` paging stops at the first page that contains a
+        rejected id (the refresh has reached stored data). The result's status
+        is 'end' when the list ran out, 'watermark', 'limit' or 'failed'.
+        A refresh (`stop_at_skip`) holds its rows until it reaches stored data
+        and writes nothing if it fails: its watermark cannot record a partial
+        range, so the next run fetches those rows again.
+        """
+        result = {'count': 0, 'min_id': None, 'max_id': None, 'status': 'limit'}
+        held = []
+        pages = 0
+        while max_pages is None or pages < max_pages:
+            submissions = await self.fetch_status_page(contest_id, start)
+            if submissions is None:
+                result['status'] = 'failed'
+                break
+            pages += 1
+
+            kept = [submission for submission in submissions if keep(submission['id'])]
+            if kept:
+                rows = [api_submission_row(submission) for submission in kept]
+                if stop_at_skip:
+                    held.extend(rows)
+                else:
+                    await sink.put_async(rows)
+                ids = [submission['id'] for submission in kept]
+                result['count'] += len(kept)
+                result['min_id'] = min(ids) if result['min_id'] is None else min(result['min_id'], min(ids))
+                result['max_id'] = max(ids) if result['max_id'] is None else max(result['max_id'], max(ids))
+
+            if len(submissions) < self.page_size:
+                result['status'] = 'end'
+                break
+            if stop_at_skip and len(kept) < len(submissions):
+                result['status'] = 'watermark'
+                break
+            start += self.page_size
+
+        if held and result['status'] != 'failed':
+            await sink.put_async(held)
+        return result
+
+    async def _checkpoint(self, contest_id: str, sink) -> None:
+        """Save `contest_id`'s watermark once the sink has written every row queued before this call."""
+        mark = self.watermarks.get(contest_id)
+        if mark is None or self.state is None:
+            return
+        mark = dict(mark)
+
+        def save():
+            # Runs on the sink's writer thread, the only place the state is saved during a run
+            self.state.get('submissions')[contest_id] = mark
+            self.state.save()
+        await asyncio.to_thread(sink.checkpoint, save)
+
+    async def scrape_contest_submissions(self, contest_id: str, sink, backfill: bool = True) -> int:
+        """Bring one contest up to date in `sink` and its watermark; returns the number of submissions written."""
+        count = await self._scrape_contest(contest_id, sink, backfill)
+        await self._checkpoint(contest_id, sink)
+        return count
+
+    async def _scrape_contest(self, contest_id: str, sink, backfill: bool) -> int:
+        mark = self.watermarks.get(contest_id)
+        if not mark:
+            result = await self._harvest(contest_id, sink, 1, lambda _: True, False, self.max_pages)
+            if result['count']:
+                self.watermarks[contest_id] = {'max_id': result['max_id'], 'min_id': result['min_id'],
+                                               'count': result['count'], 'complete': result['status'] == 'end'}
+            self.logger.info(f"Contest {contest_id}: {result['count']} submissions ({result['status']})")
+            return result['count']
+
+        # Refresh: the newest submissions down to the stored max_id. Not capped,
+        # since stopping early would leave a gap below the new max_id.
+        new = await self._harvest(contest_id, sink, 1, lambda i: i > mark['max_id'], True, None)
+        if new['status'] == 'failed':
+            # Nothing was written and the watermark stays; the next run fetches these again
+            self.logger.info(f"Contest {contest_id}: refresh failed after fetching {new['count']} submissions")
+            return 0
+        if new['count']:
+            mark['max_id'] = new['max_id']
+            mark['count'] += new['count']
+
+        old = {'count': 0, 'status': 'complete'}
+        if backfill and not mark['complete']:
+            # New submissions can shift positions between pages; ids at or above
+            # min_id are already stored and are skipped
+            old = await self._harvest(contest_id, sink, mark['count'] + 1, lambda i: i < mark['min_id'], False,
+                                      self.max_pages)
+            if old['count']:
+                mark['min_id'] = old['min_id']
+                mark['count'] += old['count']
+            mark['complete'] = old['status'] == 'end'
+
+        self.logger.info(f"Contest {contest_id}: {new['count']} new, {old['count']} backfilled ({old['status']})")
+        return new['count'] + old['count']
+
+    async def _run(self, contest_ids: Iterable[str], sink, backfill: bool) -> int:
+        contest_queue = asyncio.Queue()
+        for contest_id in contest_ids:
+            contest_queue.put_nowait(str(contest_id))
+
+        async def worker():
+            count = 0
+            while not contest_queue.empty():
+                count += await self.scrape_contest_submissions(contest_queue.get_nowait(), sink, backfill)
+            return count
+
+        async with FetchEngine(rate=self.rate, max_connections=self.max_contests, cache=self.cache) as engine:
+            self.engine = engine
+            counts = await asyncio.gather(*(worker() for _ in range(self.max_contests)))
+            self.engine = None
+        return sum(counts)
+
+    def run_scraper(self, contest_ids: Iterable[str], output: str = 'submissions_store', backfill: bool = True,
+                    state: Optional[ScrapeState] = None) -> int:
+        """
+        Harvest `contest_ids` into `output` (a Parquet store directory, or a CSV file when it ends in .csv).
+
+        Each contest's watermark is saved only after the sink has flushed its
+        rows, so a crash never records submissions that did not reach the
+        disk, and never loses the progress of contests that did.
+        """
+        self.state = state or ScrapeState()
+        # Working copy; the state itself only receives checkpointed watermarks
+        self.watermarks = copy.deepcopy(self.state.get('submissions'))
+        if output.endswith('.csv'):
+            sink = DedupCsvWriter(output, SUBMISSION_FIELDS, key='submission_id', append=True)
+        else:
+            sink = ParquetSink(output)
+        with sink:
+            total = asyncio.run(self._run(contest_ids, sink, backfill))
+        return total
 
-    @staticmethod
-    def _extract_username(user_cell: BeautifulSoup) -> str:
-        """Extract username from user cell"""
-        user_link = user_cell.find('a')
-        return user_link.text.strip() if user_link else ""
-
-    @staticmethod
-    def _has_next_page(soup: BeautifulSoup) -> bool:
-        """Check if there's a next page of submissions"""
-        pagination = soup.find('div', {'class': 'pagination'})
-        if not pagination:
-            return False
-        next_link = pagination.find('span', {'class': 'next'})
-        return bool(next_link)
-
-    def run_scraper(self, contest_ids: List[str]) -> None:
-        """Main method to run the scraper"""
-        try:
-            for contest_id in contest_ids:
-                submissions_url = f"https://codeforces.com/contest/{contest_id}/status"
-                submissions = self.scrape_contest_submissions(contest_id, submissions_url)
-                self.submissions_data.extend(submissions)
-
-            self.utils.save_to_csv(self.submissions_data, 'submissions.csv')
-            
-        except Exception as e:
-            logging.error(f"Error in submission scraping: {str(e)}")
-            raise
 
 if __name__ == "__main__":
-    # For testing purposes
-    scraper = SubmissionScraper(max_pages_per_contest=5)
-    test_contest_ids = ["1234", "1235"]  # Replace with actual contest IDs
-    scraper.run_scraper(test_contest_ids)
\ No newline at end of file
+    # python submissions_scraper.py [--csv] [--no-backfill] [contest_id ...]
+    # Contest ids from the command line, or every contest in contests_cleaned.csv
+    args = sys.argv[1:]
+    flags = {arg for arg in args if arg.startswith('--')}
+    contest_ids = [arg for arg in args if not arg.startswith('--')]
+    if not contest_ids:
+        contest_ids = read_table('contests_cleaned.csv', 'contests')['contest_id'].dropna().astype(str).tolist()
+
+    scraper = SubmissionScraper(cache=ResponseCache.from_env())
+    output = 'submissions.csv' if '--csv' in flags else 'submissions_store'
+    total = scraper.run_scraper(contest_ids, output, backfill='--no-backfill' not in flags)
+    print(f"Scraped {total} submissions from {len(contest_ids)} contests")
\ No newline at end of file
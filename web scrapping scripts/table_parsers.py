@@ -0,0 +1,170 @@
+"""
+Row extraction for the contest and problemset tables.
+
+Each parse function takes the raw page bytes and returns a list of row dicts.
+The backend is pluggable:
+
+    'lxml'     - lxml.html tree of the whole page (built by libxml2 in C),
+                 then XPath straight to the target table (default)
+    'bs4'      - BeautifulSoup with a SoupStrainer, so only <table> markup is
+                 turned into a DOM
+    'bs4-full' - the original approach: a full html.parser DOM of the page
+
+All backends walk each row's cells exactly once and return identical rows.
+They are plain module-level functions so they can be shipped to worker
+processes.
+"""
+import logging
+
+import lxml.html
+from bs4 import BeautifulSoup, SoupStrainer
+
+BACKENDS = ('lxml', 'bs4', 'bs4-full')
+DEFAULT_BACKEND = 'lxml'
+
+logger = logging.getLogger(__name__)
+
+
+def _has_class(class_name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')"
+
+
+def _lxml_text(element):
+    # Same result as BeautifulSoup's get_text(strip=True)
+    return ''.join(s.strip() for s in element.xpath('.//text()'))
+
+
+def _contest_row(name_cell, cells, text, links, href):
+    """Build a contest row from already-split cells using backend accessors."""
+    if name_cell is None:
+        return None
+
+    contest_id = ''
+    name_links = links(name_cell)
+    if name_links:
+        contest_id = (href(name_links[0]) or '').split('/')[-1]
+        if not contest_id.isdigit():
+            contest_id = ''
+
+    return {
+        'contest_id': contest_id,
+        'contest_name': text(name_cell),
+        'writers': ', '.join(text(a) for a in links(cells[1])) if len(cells) > 1 else '',
+        'start_time': text(cells[2]) if len(cells) > 2 else '',
+        'length': text(cells[3]) if len(cells) > 3 else ''
+    }
+
+
+def _parse_contests_lxml(content):
+    tree = lxml.html.fromstring(content)
+    rows = []
+    # Tables with an empty class attribute, as find_all('table', class_='') matches
+    for table in tree.xpath("//table[@class and not(normalize-space(@class))]"):
+        for row in table.xpath('.//tr')[1:]:
+            try:
+                cells = row.xpath('.//td')
+                name_cell = next((c for c in cells if c.get('class') is None), None)
+                contest = _contest_row(name_cell, cells, _lxml_text, lambda el: el.xpath('.//a'), lambda a: a.get('href'))
+                if contest:
+                    rows.append(contest)
+            except Exception as e:
+                logger.info(f"Error extracting contest data: {e}")
+    return rows
+
+
+def _parse_contests_soup(soup):
+    rows = []
+    for table in soup.find_all('table', class_=''):
+        for row in table.find_all('tr')[1:]:
+            try:
+                cells = row.find_all('td')
+                name_cell = next((c for c in cells if c.get('class') is None), None)
+                contest = _contest_row(
+                    name_cell, cells,
+                    lambda el: el.get_text(strip=True), lambda el: el.find_all('a'), lambda a: a.get('href')
+                )
+                if contest:
+                    rows.append(contest)
+            except Exception as e:
+                logger.info(f"Error extracting contest data: {e}")
+    return rows
+
+
+def _problem_row(problem_id, title, tags, difficulty):
+    return {
+        'problem_id': problem_id,
+        'title': title,
+        'tags': ', '.join(t for t in tags if t),
+        'difficulty': difficulty
+    }
+
+
+def _parse_problems_lxml(content):
+    tree = lxml.html.fromstring(content)
+    tables = tree.xpath(f"//table[{_has_class('problems')}]")
+    if not tables:
+        return []
+
+    rows = []
+    for row in tables[0].xpath('.//tr')[1:]:
+        try:
+            cells = row.xpath('.//td')
+            if len(cells) < 2:
+                continue
+            title_div = cells[1].xpath('.//div')[0]
+            tags = cells[1].xpath(f".//a[{_has_class('notice')}]")
+            rating = row.xpath(f".//span[{_has_class('ProblemRating')}]")
+            rows.append(_problem_row(
+                _lxml_text(cells[0].xpath('.//a')[0]),
+                _lxml_text(title_div),
+                [_lxml_text(t) for t in tags],
+                _lxml_text(rating[0]) if rating else ''
+            ))
+        except Exception as e:
+            logger.info(f"Error extracting problem data: {e}")
+    return rows
+
+
+def _parse_problems_soup(soup):
+    table = soup.find('table', class_='problems')
+    if not table:
+        return []
+
+    rows = []
+    for row in table.find_all('tr')[1:]:
+        try:
+            cells = row.find_all('td')
+            if len(cells) < 2:
+                continue
+            rating = row.find('span', class_='ProblemRating')
+            rows.append(_problem_row(
+                cells[0].find('a').get_text(strip=True),
+                cells[1].find('div').get_text(strip=True),
+                [t.get_text(strip=True) for t in cells[1].find_all('a', class_='notice')],
+                rating.get_text(strip=True) if rating else ''
+            ))
+        except Exception as e:
+            logger.info(f"Error extracting problem data: {e}")
+    return rows
+
+
+def parse_contest_rows(content, backend=DEFAULT_BACKEND):
+    """Extract contest rows from a /contests page."""
+    if backend == 'lxml':
+        return _parse_contests_lxml(content)
+    if backend == 'bs4':
+        return _parse_contests_soup(BeautifulSoup(content, 'lxml', parse_only=SoupStrainer('table')))
+    if backend == 'bs4-full':
+        return _parse_contests_soup(BeautifulSoup(content, 'html.parser'))
+    raise ValueError(f"Unknown parser backend: {backend}")
+
+
+def parse_problem_rows(content, backend=DEFAULT_BACKEND):
+    """Extract problem rows from a /problemset page."""
+    if backend == 'lxml':
+        return _parse_problems_lxml(content)
+    if backend == 'bs4':
+        return _parse_problems_soup(BeautifulSoup(content, 'lxml', parse_only=SoupStrainer('table', class_='problems')))
+    if backend == 'bs4-full':
+        return _parse_problems_soup(BeautifulSoup(content, 'html.parser'))
+    raise ValueError(f"Unknown parser backend: {backend}")
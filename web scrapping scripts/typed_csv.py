@@ -0,0 +1,87 @@
+"""
+Typed CSV reader shared by the loaders and cleaners.
+
+Every CSV in the tree has an explicit schema below. read_table parses the
+whole file as text with the pyarrow engine (falling back to pandas' C engine
+when pyarrow is missing or rejects the file) and then coerces each column in
+one vectorized pass:
+
+    'Int64'   - '1', '1.0' and ' 1 ' become 1; '', 'null' and anything else
+                that is not a number become <NA>
+    'boolean' - 'True'/'False' in any case, everything else <NA>
+    'string'  - kept verbatim, '' becomes <NA>
+
+Integer columns stay nullable Int64, so writing the frame back with to_csv
+never turns ids into floats ('1.0') and no fix-up pass is needed. Columns a
+schema does not list are read as 'string'.
+"""
+import importlib.util
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+ENGINE = 'pyarrow' if importlib.util.find_spec('pyarrow') else 'c'
+
+SCHEMAS = {
+    'User': {
+        'user_id': 'Int64', 'username': 'string', 'rating': 'Int64', 'rank': 'string', 'max_rating': 'Int64',
+        'contribution': 'Int64', 'organization_id': 'Int64', 'organization': 'string', 'friend_count': 'Int64',
+        'registration_date': 'string', 'city': 'string', 'country_id': 'Int64', 'country': 'string',
+        'max_streak': 'Int64', 'problems_solved': 'Int64', 'processed': 'boolean',
+        # Kept by submission_metrics.apply_to_users next to the computed values
+        'scraped_max_streak': 'Int64', 'scraped_problems_solved': 'Int64'
+    },
+    'contests': {
+        'contest_id': 'Int64', 'contest_name': 'string', 'writers': 'string', 'start_time': 'string',
+        'length': 'string'
+    },
+    'problem': {'problem_id': 'string', 'title': 'string', 'tags': 'string', 'difficulty': 'Int64'},
+    'tag': {'tag_id': 'Int64', 'name': 'string'},
+    'problemTag': {'problem_id': 'string', 'tag_id': 'Int64'},
+    'organization': {'organization_id': 'Int64', 'name': 'string'},
+    'country': {'country_id': 'Int64', 'name': 'string'},
+    'contestWriters': {'contest_id': 'Int64', 'username': 'string'},
+}
+
+
+def to_int(series):
+    """Coerce a column to Int64; values that are not numbers become <NA>."""
+    numbers = pd.to_numeric(series, errors='coerce').astype('float64')
+    return np.trunc(numbers).astype('Int64')
+
+
+def to_bool(series):
+    return series.str.lower().map({'true': True, 'false': False}).astype('boolean')
+
+
+def to_text(series):
+    return series.astype('string').replace('', pd.NA)
+
+
+CONVERTERS = {'Int64': to_int, 'boolean': to_bool, 'string': to_text}
+
+
+def _read_text(path, **kwargs):
+    if ENGINE == 'pyarrow':
+        try:
+            return pd.read_csv(path, dtype=str, keep_default_na=False, engine='pyarrow', **kwargs)
+        except Exception as e:
+            logger.info(f"pyarrow could not parse {path} ({e}), falling back to the C engine")
+    return pd.read_csv(path, dtype=str, keep_default_na=False, engine='c', **kwargs)
+
+
+def read_table(path, table, **kwargs):
+    """
+    Read `path` with the schema SCHEMAS[table].
+
+    Extra keyword arguments go to pd.read_csv (e.g. quotechar="'" for the
+    user exports).
+    """
+    schema = SCHEMAS[table]
+    df = _read_text(path, **kwargs)
+    for column in df.columns:
+        df[column] = CONVERTERS[schema.get(column, 'string')](df[column])
+    return df
\ No newline at end of file
@@ -1,24 +1,99 @@
 import pandas as pd
 import concurrent.futures
+import itertools
+import json
 import logging
 import time
-import random
 import re
 import cloudscraper
 from bs4 import BeautifulSoup
 from fake_useragent import UserAgent
 import math
+import os
 import requests
 import gc
 from memory_profiler import profile
+from fetch_engine import AdaptiveRateLimiter
+from response_cache import ResponseCache, CacheMissError, fetch_with_cache
+from typed_csv import read_table
+
+MAX_STREAK_PATTERN = re.compile(r'(\d+)\s+days\s+in\s+a\s+row\s+max\.')
+PROBLEMS_SOLVED_PATTERN = re.compile(r'(\d+)\s+problems\s+solved\s+for\s+all\s+time')
+
+# Raw-HTML versions of the two patterns, combined so one scan finds both.
+# Tags may sit between the number and its description, e.g.
+# <div>56 days</div><div>in a row max.</div>
+_TAGS = rb'(?:\s*<[^>]*>)*\s*'
+PROFILE_METRICS_PATTERN = re.compile(
+    rb'(?P<max_streak>\d+)\s+days' + _TAGS + rb'in\s+a\s+row\s+max\.'
+    rb'|(?P<problems_solved>\d+)\s+problems' + _TAGS + rb'solved\s+for\s+all\s+time'
+)
+# Both counters live in the activity frame footer; scanning starts there
+ACTIVITY_FOOTER_MARKER = b'_UserActivityFrame_footer'
+ACTIVITY_FOOTER_WINDOW = 16 * 1024
+
+def _scan_profile_metrics(content):
+    metrics = {'max_streak': None, 'problems_solved': None}
+    for match in PROFILE_METRICS_PATTERN.finditer(content):
+        metrics[match.lastgroup] = int(match.group(match.lastgroup))
+        if None not in metrics.values():
+            break
+    return metrics['max_streak'], metrics['problems_solved']
+
+def _extract_profile_metrics_fast(content):
+    """Regex scan over the raw page bytes, narrowed to the activity footer when possible."""
+    start = content.find(ACTIVITY_FOOTER_MARKER)
+    if start != -1:
+        metrics = _scan_profile_metrics(content[start:start + ACTIVITY_FOOTER_WINDOW])
+        if None not in metrics:
+            return metrics
+    return _scan_profile_metrics(content)
+
+def _extract_profile_metrics_dom(content):
+    """Slow path: flatten the whole DOM to text and search it."""
+    text = BeautifulSoup(content, 'html.parser').get_text(separator=' ')
+    streak_match = MAX_STREAK_PATTERN.search(text)
+    solved_match = PROBLEMS_SOLVED_PATTERN.search(text)
+    return (
+        int(streak_match.group(1)) if streak_match else None,
+        int(solved_match.group(1)) if solved_match else None
+    )
+
+def extract_profile_metrics(content, dom_pool=None):
+    """
+    Extract (max_streak, problems_solved) from a profile page.
+
+    The raw bytes are scanned once; the page is only parsed into a DOM when
+    that misses a value, in `dom_pool` (a process pool) when given. Either
+    value is None when it is missing from the page.
+    """
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    max_streak, problems_solved = _extract_profile_metrics_fast(content)
+    if max_streak is None or problems_solved is None:
+        if dom_pool:
+            dom_streak, dom_solved = dom_pool.submit(_extract_profile_metrics_dom, content).result()
+        else:
+            dom_streak, dom_solved = _extract_profile_metrics_dom(content)
+        max_streak = max_streak if max_streak is not None else dom_streak
+        problems_solved = problems_solved if problems_solved is not None else dom_solved
+    return max_streak, problems_solved
 
 class CodeforcesProfileScraper:
-    def __init__(self, input_file='codeforces_users.csv', retry_count=3, backoff_factor=0.5, batch_size=50):
+    def __init__(self, input_file='codeforces_users.csv', retry_count=3, backoff_factor=0.5, batch_size=50, cache=None, parse_workers=None,
+                 max_workers=15, limiter=None, base_url="https://codeforces.com/profile/"):
         self.input_file = input_file
+        self.journal_file = f"{input_file}.journal"  # Append-only log of scraped profiles
+        self.parse_workers = parse_workers or os.cpu_count()
+        self.parse_pool = None  # ProcessPoolExecutor for the DOM fallback while update_users_data runs
+        self.cache = cache  # Optional ResponseCache; cached profiles skip the delay and the request
         self.retry_count = retry_count
         self.backoff_factor = backoff_factor
         self.batch_size = batch_size
-        self.base_url = "https://codeforces.com/profile/"
+        self.base_url = base_url
+        self.max_workers = max_workers  # Size of the one long-lived I/O thread pool
+        # Shared by all threads: backs off globally on 403/429 and ramps up again on success
+        self.limiter = limiter or AdaptiveRateLimiter()
 
         # Setup logging
         logging.basicConfig(
@@ -42,61 +117,38 @@ class CodeforcesProfileScraper:
 
         self.ua = UserAgent()
 
-    def add_dynamic_delay(self):
-        """Add a delay between requests to avoid overwhelming the server."""
-        delay = random.uniform(1.5, 4)  # Delay between 1.5 to 4 seconds
-        self.logger.debug(f"Applying delay of {delay:.2f} seconds.")
-        time.sleep(delay)
-
-    def _extract_max_streak(self, soup):
-        """Extract max streak from the user's profile page."""
-        try:
-            text = soup.get_text(separator=' ')
-            match = re.search(r'(\d+)\s+days\s+in\s+a\s+row\s+max\.', text)
-            if match:
-                max_streak = int(match.group(1))
-                return max_streak
-        except Exception as e:
-            self.logger.error(f"Error extracting max streak: {e}")
-        return None
-
-    def _extract_problems_solved(self, soup):
-        """Extract total problems solved from the user's profile page."""
-        try:
-            text = soup.get_text(separator=' ')
-            match = re.search(r'(\d+)\s+problems\s+solved\s+for\s+all\s+time', text)
-            if match:
-                problems_solved = int(match.group(1))
-                return problems_solved
-        except Exception as e:
-            self.logger.error(f"Error extracting problems solved: {e}")
-        return None
-
-    def scrape_profile(self, username):
-        """Scrape max_streak and problems_solved for a single user."""
+    def scrape_profile(self, username, force_refresh=False):
+        """Scrape max_streak and problems_solved for a single user; `force_refresh` skips fresh cache hits."""
         try:
             url = f"{self.base_url}{username}"
 
             for attempt in range(self.retry_count):
                 try:
-                    self.add_dynamic_delay()
-
-                    headers = {
-                        'User-Agent': self.ua.random
-                    }
+                    body = self.cache.get_fresh(url) if self.cache and not force_refresh else None
+                    if body is None:
+                        if not (self.cache and self.cache.offline):
+                            self.limiter.acquire()
 
-                    response = self.scraper.get(url, headers=headers, timeout=10)
-                    response.raise_for_status()
+                        headers = {
+                            'User-Agent': self.ua.random
+                        }
 
-                    soup = BeautifulSoup(response.text, 'html.parser')
+                        if self.cache:
+                            body = fetch_with_cache(self.scraper, url, self.cache, revalidate=force_refresh,
+                                                    headers=headers, timeout=10)
+                        else:
+                            response = self.scraper.get(url, headers=headers, timeout=10)
+                            response.raise_for_status()
+                            body = response.content
+                            del response
+                        self.limiter.on_success()
 
-                    # Extract data
-                    max_streak = self._extract_max_streak(soup)
-                    problems_solved = self._extract_problems_solved(soup)
+                    # The byte scan takes microseconds and runs right here;
+                    # only the rare DOM fallback goes to the process pool
+                    max_streak, problems_solved = extract_profile_metrics(body, self.parse_pool)
 
                     # Explicitly delete large objects
-                    del response
-                    del soup
+                    del body
 
                     if max_streak is not None or problems_solved is not None:
                         return {
@@ -108,14 +160,19 @@ class CodeforcesProfileScraper:
                         raise Exception("Failed to extract required data")
 
                 except requests.exceptions.HTTPError as e:
-                    if e.response.status_code == 403:
-                        self.logger.error(f"Received 403 Forbidden for {username}. Backing off.")
-                        time.sleep(60)  # Wait longer before retrying
+                    if e.response.status_code in (403, 429):
+                        # Slow every thread down instead of parking this one;
+                        # the retry waits in limiter.acquire() for the cooldown
+                        self.logger.error(f"Received {e.response.status_code} for {username}. Backing off.")
+                        self.limiter.on_throttle()
                     else:
                         self.logger.error(f"HTTP Error for {username}: {e}")
 
                     if attempt >= self.retry_count - 1:
                         raise
+                except CacheMissError:
+                    self.logger.warning(f"No cached profile for {username} in cache-only mode")
+                    return None
                 except Exception as e:
                     self.logger.error(f"Error on attempt {attempt + 1} for {username}: {str(e)}")
                     # Exponential backoff
@@ -130,62 +187,153 @@ class CodeforcesProfileScraper:
             self.logger.error(f"Error scraping profile for {username}: {e}")
             return None
 
-    @profile
-    def update_users_data(self):
-        """Update existing CSV with max_streak and problems_solved."""
-        try:
-            # Read existing CSV
-            df = pd.read_csv(self.input_file)
+    def _load_users(self):
+        """Read the users CSV and make sure the scraped columns exist."""
+        df = read_table(self.input_file, 'User')
 
-            # Ensure necessary columns exist
-            if 'max_streak' not in df.columns:
-                df['max_streak'] = pd.Series(dtype='Int64')
-            else:
-                df['max_streak'] = df['max_streak'].astype('Int64')
+        # Ensure necessary columns exist
+        if 'max_streak' not in df.columns:
+            df['max_streak'] = pd.Series(dtype='Int64')
 
-            if 'problems_solved' not in df.columns:
-                df['problems_solved'] = pd.Series(dtype='Int64')
-            else:
-                df['problems_solved'] = df['problems_solved'].astype('Int64')
+        if 'problems_solved' not in df.columns:
+            df['problems_solved'] = pd.Series(dtype='Int64')
 
-            if 'processed' not in df.columns:
-                df['processed'] = False
+        if 'processed' not in df.columns:
+            df['processed'] = False
+        df['processed'] = df['processed'].fillna(False).astype(bool)
 
-            total_users = len(df)
-            self.logger.info(f"Processing {total_users} users")
+        return df
 
-            # Filter out already processed users
-            users_to_process = df[~df['processed']]['username'].tolist()
+    def replay_journal(self):
+        """Return {username: result} for every profile recorded in the journal."""
+        results = {}
+        if not os.path.exists(self.journal_file):
+            return results
+
+        with open(self.journal_file, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Torn last line from an interrupted run
+                results[entry['username']] = entry
+        return results
+
+    def _open_journal(self):
+        """Open the journal for appending; a torn last line is ended first so it cannot swallow the next entry."""
+        journal = open(self.journal_file, 'a', encoding='utf-8')
+        if journal.tell():
+            with open(self.journal_file, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    journal.write('\n')
+        return journal
+
+    def compact_journal(self, df=None):
+        """
+        Apply the journal to the CSV in one vectorized pass, then remove the journal.
+
+        Journaled handles that are not in the CSV are appended as new rows.
+        """
+        results = self.replay_journal()
+        if not results:
+            return
+        if df is None:
+            df = self._load_users()
+
+        updates = pd.DataFrame(list(results.values())).set_index('username')
+        hit = df['username'].isin(updates.index)
+        usernames = df.loc[hit, 'username']
+        df.loc[hit, 'max_streak'] = usernames.map(updates['max_streak']).astype('Int64')
+        df.loc[hit, 'problems_solved'] = usernames.map(updates['problems_solved']).astype('Int64')
+        df.loc[hit, 'processed'] = True
+
+        # Handles the CSV does not have yet (e.g. new ratedList users queued by
+        # refresh_planner) are appended, so their results are not lost
+        new_users = updates.loc[~updates.index.isin(df['username'].dropna()), ['max_streak', 'problems_solved']]
+        if len(new_users):
+            added = new_users.astype('Int64').rename_axis('username').reset_index()
+            added['username'] = added['username'].astype('string')
+            added['processed'] = True
+            df = pd.concat([df, added], ignore_index=True)
+
+        tmp_file = f"{self.input_file}.tmp"
+        df.to_csv(tmp_file, index=False)
+        os.replace(tmp_file, self.input_file)
+        os.remove(self.journal_file)
+        self.logger.info(f"Compacted {len(results)} journaled profiles into {self.input_file}")
 
-            # Process users in batches
-            for start in range(0, len(users_to_process), self.batch_size):
-                end = start + self.batch_size
-                batch = users_to_process[start:end]
-                self.logger.info(f"Processing batch {start // self.batch_size + 1} with {len(batch)} users")
+    @profile
+    def update_users_data(self, compact=True, usernames=None, force_refresh=False):
+        """
+        Scrape max_streak and problems_solved for every unprocessed user.
+
+        `usernames` (e.g. from refresh_planner) replaces the unprocessed set
+        with an explicit list of handles to re-scrape; `force_refresh` makes
+        them bypass fresh cached pages. Returns the results keyed by handle,
+        journaled ones included.
+
+        Each result is appended to an on-disk journal as soon as it arrives
+        (flushed every batch_size profiles) instead of rewriting the CSV; a rerun
+        replays the journal and skips those users. The journal is folded into
+        the CSV at the end, or on demand with compact_journal().
+        """
+        try:
+            df = self._load_users()
 
-                with concurrent.futures.ThreadPoolExecutor(max_workers=15) as executor:
-                    future_to_username = {executor.submit(self.scrape_profile, username): username for username in batch}
+            total_users = len(df)
+            self.logger.info(f"Processing {total_users} users")
 
-                    for i, future in enumerate(concurrent.futures.as_completed(future_to_username), 1):
-                        username = future_to_username.pop(future)
+            # Skip users that are processed in the CSV or already in the journal
+            results = self.replay_journal()
+            if usernames is None:
+                usernames = df.loc[~df['processed'], 'username']
+            users_to_process = [u for u in usernames if u not in results]
+            self.logger.info(f"Resuming with {len(results)} journaled profiles, {len(users_to_process)} left")
+
+            # One long-lived thread pool does the I/O, fed continuously: a new
+            # user is submitted as soon as one finishes, so a straggler never
+            # holds up the rest. Pages the byte scan cannot read are parsed
+            # across all cores in the process pool.
+            queue = iter(users_to_process)
+            completed = 0
+            with concurrent.futures.ProcessPoolExecutor(max_workers=self.parse_workers) as self.parse_pool, \
+                    concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor, \
+                    self._open_journal() as journal:
+                pending = {}
+                for username in itertools.islice(queue, self.max_workers * 2):
+                    pending[executor.submit(self.scrape_profile, username, force_refresh)] = username
+
+                while pending:
+                    done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        username = pending.pop(future)
                         try:
                             result = future.result()
                             if result:
-                                # Update DataFrame with new data
-                                mask = df['username'] == result['username']
-                                df.loc[mask, 'max_streak'] = result['max_streak'] if result['max_streak'] is not None else pd.NA
-                                df.loc[mask, 'problems_solved'] = result['problems_solved'] if result['problems_solved'] is not None else pd.NA
-                                df.loc[mask, 'processed'] = True
-
+                                results[result['username']] = result
+                                journal.write(json.dumps(result) + '\n')
                         except Exception as e:
                             self.logger.error(f"Error processing user {username}: {e}")
 
-                # Save progress after each batch
-                df.to_csv(self.input_file, index=False)
-                self.logger.info(f"Completed batch {start // self.batch_size + 1}")
-                gc.collect()  # Explicit garbage collection
+                        completed += 1
+                        # Checkpoint every batch_size profiles
+                        if completed % self.batch_size == 0:
+                            journal.flush()
+                            self.logger.info(f"Completed {completed}/{len(users_to_process)} users, "
+                                             f"rate {self.limiter.rate:.2f}/s")
+                            gc.collect()  # Explicit garbage collection
+
+                        next_username = next(queue, None)
+                        if next_username is not None:
+                            pending[executor.submit(self.scrape_profile, next_username, force_refresh)] = next_username
+            self.parse_pool = None
+
+            if compact:
+                self.compact_journal(df)
             
             self.logger.info("Successfully updated all user profiles")
+            return results
 
         except Exception as e:
             self.logger.error(f"Error updating users data: {e}")
@@ -194,7 +342,8 @@ if __name__ == "__main__":
     try:
         scraper = CodeforcesProfileScraper(
             input_file='codeforces_users.csv',
-            retry_count=3
+            retry_count=3,
+            cache=ResponseCache.from_env()
         )
         scraper.update_users_data()
     except KeyboardInterrupt:
@@ -2,11 +2,39 @@ import requests
 import time
 import json
 import csv
+import os
+import sys
+import ijson
 from datetime import datetime
+from response_cache import ResponseCache, CacheMissError, cache_key, fetch_with_cache, open_with_cache
+
+USER_FIELDS = [
+    'username', 'rating', 'rank', 'max_rating', 'contribution', 'organization',
+    'friend_count', 'registration_date', 'city', 'country'
+]
+
+def user_row(user):
+    """Map a user.ratedList entry to a codeforces_users.csv row."""
+    # Get only the data available directly from the API
+    return {
+        'username': user.get('handle', ''),
+        'rating': user.get('rating', 0),
+        'rank': user.get('rank', ''),
+        'max_rating': user.get('maxRating', 0),
+        'contribution': user.get('contribution', 0),
+        'organization': user.get('organization', ''),
+        'friend_count': user.get('friendOfCount', 0),
+        'registration_date': datetime.fromtimestamp(
+            user.get('registrationTimeSeconds', 0)
+        ).strftime('%Y-%m-%d'),
+        'city': user.get('city', ''),
+        'country': user.get('country', '')
+    }
 
 class CodeforcesUserCrawler:
-    def __init__(self, api_key=None, api_secret=None):
-        self.base_url = "https://codeforces.com/api/"
+    def __init__(self, api_key=None, api_secret=None, base_url="https://codeforces.com/api/", cache=None):
+        self.base_url = base_url
+        self.cache = cache  # Optional ResponseCache shared with the other scrapers
         self.api_key = api_key
         self.api_secret = api_secret
         # Rate limiting - Codeforces has a limit of 2 requests per second
@@ -21,11 +49,15 @@ class CodeforcesUserCrawler:
                      for k, v in params.items()}
             
         try:
+            if self.cache:
+                if self.cache.get_fresh(cache_key(url, params)) is None:
+                    time.sleep(self.request_delay)  # Rate limiting
+                return json.loads(fetch_with_cache(requests, url, self.cache, params=params))
             time.sleep(self.request_delay)  # Rate limiting
             response = requests.get(url, params=params)
             response.raise_for_status()
             return response.json()
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, CacheMissError) as e:
             print(f"Error making request to {url}: {str(e)}")
             return None
         
@@ -41,6 +73,87 @@ class CodeforcesUserCrawler:
             return response['result']
         return []
     
+    def _iter_users(self):
+        url = f"{self.base_url}user.ratedList"
+        params = {'activeOnly': 'false', 'includeRetired': 'false'}
+
+        if self.cache:
+            # The body goes through a temporary file into the cache and is
+            # parsed from there, so it is never held in memory either
+            key = cache_key(url, params)
+            entry = self.cache.get(key, with_body=False)
+            if entry is None or not self.cache.is_fresh(key, entry):
+                time.sleep(self.request_delay)  # Rate limiting
+            with open_with_cache(requests, url, self.cache, params=params, timeout=300) as body:
+                yield from ijson.items(body, 'result.item', use_float=True)
+            return
+
+        time.sleep(self.request_delay)  # Rate limiting
+        with requests.get(url, params=params, stream=True, timeout=300) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True  # Let urllib3 undo gzip
+            yield from ijson.items(response.raw, 'result.item', use_float=True)
+
+    def iter_users(self):
+        """
+        Yield user.ratedList entries one at a time while the response streams in.
+
+        The body is parsed incrementally with ijson, so memory use does not
+        depend on the number of users. With a cache the request goes through
+        open_with_cache (so CF_CACHE_ONLY=1 works offline), which streams the
+        body to disk instead of memory. Like
+        _make_request, a failed request is printed and ends the iteration.
+        """
+        try:
+            yield from self._iter_users()
+        except (requests.exceptions.RequestException, CacheMissError, ijson.JSONError) as e:
+            print(f"Error making request to {self.base_url}user.ratedList: {str(e)}")
+
+    def stream_user_data(self, csv_file='codeforces_users.csv', jsonl_file='codeforces_users.jsonl'):
+        """
+        Write every user to CSV and JSON Lines as soon as it is parsed; returns the count.
+
+        Rows go to temporary files that replace the outputs only once the
+        whole list was read, so a failed request leaves the old files alone.
+        """
+        count = 0
+        csv_tmp, jsonl_tmp = f"{csv_file}.tmp", f"{jsonl_file}.tmp"
+        try:
+            with open(csv_tmp, 'w', newline='', encoding='utf-8') as csv_f, \
+                    open(jsonl_tmp, 'w', encoding='utf-8') as jsonl_f:
+                writer = csv.DictWriter(csv_f, fieldnames=USER_FIELDS)
+                writer.writeheader()
+
+                for user in self._iter_users():
+                    try:
+                        row = user_row(user)
+                    except Exception as e:
+                        print(f"Error processing user {user.get('handle', 'unknown')}: {str(e)}")
+                        continue
+                    writer.writerow(row)
+                    jsonl_f.write(json.dumps(row, ensure_ascii=False) + '\n')
+                    count += 1
+
+                    if count % 10000 == 0:
+                        print(f"Processed {count} users")
+        except (requests.exceptions.RequestException, CacheMissError, ijson.JSONError) as e:
+            print(f"Error making request to {self.base_url}user.ratedList: {str(e)}")
+            for path in (csv_tmp, jsonl_tmp):
+                if os.path.exists(path):
+                    os.remove(path)
+            return 0
+
+        if count == 0:
+            print("No data to save")
+            os.remove(csv_tmp)
+            os.remove(jsonl_tmp)
+            return 0
+
+        os.replace(csv_tmp, csv_file)
+        os.replace(jsonl_tmp, jsonl_file)
+        print(f"Completed streaming {count} users")
+        return count
+
     def get_all_user_data(self):
         """Get all required user data from the API"""
         users = self.get_users()
@@ -49,23 +162,7 @@ class CodeforcesUserCrawler:
         
         for i, user in enumerate(users, 1):
             try:
-                # Get only the data available directly from the API
-                user_data = {
-                    'username': user.get('handle', ''),
-                    'rating': user.get('rating', 0),
-                    'rank': user.get('rank', ''),
-                    'max_rating': user.get('maxRating', 0),
-                    'contribution': user.get('contribution', 0),
-                    'organization': user.get('organization', ''),
-                    'friend_count': user.get('friendOfCount', 0),
-                    'registration_date': datetime.fromtimestamp(
-                        user.get('registrationTimeSeconds', 0)
-                    ).strftime('%Y-%m-%d'),
-                    'city': user.get('city', ''),
-                    'country': user.get('country', '')
-                }
-                
-                complete_user_data.append(user_data)
+                complete_user_data.append(user_row(user))
                 
                 # Print progress every 100 users
                 if i % 100 == 0:
@@ -103,11 +200,17 @@ def save_to_json(data, filename='codeforces_users.json'):
 
 # Usage example
 if __name__ == "__main__":
-    crawler = CodeforcesUserCrawler()
-    user_data = crawler.get_all_user_data()
-    
-    # Save data in both formats
-    save_to_csv(user_data)
-    save_to_json(user_data)  # Keep JSON export as backup
-    
-    print(f"Total users saved: {len(user_data)}")
\ No newline at end of file
+    crawler = CodeforcesUserCrawler(cache=ResponseCache.from_env())
+
+    if '--in-memory' in sys.argv:
+        user_data = crawler.get_all_user_data()
+
+        # Save data in both formats
+        save_to_csv(user_data)
+        save_to_json(user_data)  # Keep JSON export as backup
+
+        print(f"Total users saved: {len(user_data)}")
+    else:
+        # Constant memory: rows are written as the response is parsed
+        total = crawler.stream_user_data()
+        print(f"Total users saved: {total}")